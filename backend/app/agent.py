@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Worker agent 模式：向主服务租用任务，在本机 FactSage 上执行并回传结果
+
+用法::
+
+    python run.py --agent http://主服务:10687 [--worker-id NAME] [--slots N]
+
+agent 与主服务使用同一份 config.json（factsage.* / mock.* / paths.*
+决定本机如何执行）；若主服务配置了 dispatch.token，agent 需配置相同值。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import settings
+from .models import JobRequest
+from .services.equisage_session import session_pool
+from .services.job_manager import execute_request
+
+logger = logging.getLogger(__name__)
+
+_RETRY_SECONDS = 5.0
+
+
+class AgentClient:
+    """主服务 /api/agents 接口的同步 HTTP 客户端（在线程池中调用）"""
+
+    def __init__(self, server_url: str, token: str = "") -> None:
+        self.base = server_url.rstrip("/") + "/api/agents"
+        self.token = token
+
+    def post(self, path: str, body: Dict[str, Any], timeout: float) -> Tuple[int, Any]:
+        req = urllib.request.Request(
+            self.base + path,
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        if self.token:
+            req.add_header("X-Agent-Token", self.token)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                raw = resp.read()
+                return resp.status, json.loads(raw) if raw else None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None
+
+    async def apost(
+        self, path: str, body: Dict[str, Any], timeout: float = 30
+    ) -> Tuple[int, Any]:
+        return await asyncio.to_thread(self.post, path, body, timeout)
+
+
+async def _heartbeat(
+    client: AgentClient, job_id: str, lease_id: str, interval: float,
+    work: asyncio.Task,
+) -> None:
+    """定期续约；租约被主服务回收时取消本地执行"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            status, _ = await client.apost(
+                f"/jobs/{job_id}/heartbeat", {"lease_id": lease_id}
+            )
+        except OSError as exc:
+            logger.warning("任务 %s 续约失败（网络）: %s", job_id, exc)
+            continue
+        if status == 409:
+            logger.warning("任务 %s 租约已被回收，放弃本地执行", job_id)
+            work.cancel()
+            return
+
+
+async def _report(client: AgentClient, path: str, body: Dict[str, Any]) -> None:
+    """回传结果，网络异常时重试（最多约一个租约周期）"""
+    for _ in range(max(1, int(settings.lease_seconds // _RETRY_SECONDS))):
+        try:
+            status, _ = await client.apost(path, body)
+        except OSError as exc:
+            logger.warning("回传 %s 失败: %s，稍后重试", path, exc)
+            await asyncio.sleep(_RETRY_SECONDS)
+            continue
+        if status >= 400:
+            logger.warning("回传 %s 被拒绝: HTTP %d", path, status)
+        return
+
+
+async def _run_leased(client: AgentClient, lease: Dict[str, Any]) -> None:
+    job_id, lease_id = lease["job_id"], lease["lease_id"]
+    request = JobRequest(**lease["request"])
+    logger.info("任务 %s 开始执行", job_id)
+
+    work = asyncio.create_task(execute_request(job_id, request))
+    beat = asyncio.create_task(
+        _heartbeat(client, job_id, lease_id, lease["lease_seconds"] / 3, work)
+    )
+    try:
+        await asyncio.wait({work})
+    finally:
+        beat.cancel()
+        if not work.done():
+            work.cancel()
+
+    if work.cancelled():
+        return
+    exc = work.exception()
+    if exc is not None:
+        logger.error("任务 %s 失败: %s", job_id, exc, exc_info=exc)
+        await _report(
+            client, f"/jobs/{job_id}/fail", {"lease_id": lease_id, "error": str(exc)}
+        )
+        return
+
+    result = work.result()
+    logger.info("任务 %s 完成, alpha_Ca=%.4f g", job_id, result.alpha_Ca_g)
+    await _report(
+        client,
+        f"/jobs/{job_id}/complete",
+        {"lease_id": lease_id, "result": result.model_dump()},
+    )
+
+
+async def _slot_loop(client: AgentClient, worker_id: str) -> None:
+    wait = settings.agent_wait_seconds
+    while True:
+        try:
+            status, lease = await client.apost(
+                "/lease",
+                {"worker_id": worker_id, "wait_seconds": wait},
+                timeout=wait + 30,
+            )
+        except OSError as exc:
+            logger.warning("连接主服务失败: %s，%.0fs 后重试", exc, _RETRY_SECONDS)
+            await asyncio.sleep(_RETRY_SECONDS)
+            continue
+        if status == 204 or lease is None:
+            continue
+        if status != 200:
+            logger.error("租用任务被拒绝: HTTP %d", status)
+            await asyncio.sleep(_RETRY_SECONDS)
+            continue
+        await _run_leased(client, lease)
+
+
+async def run_agent(
+    server_url: str, worker_id: Optional[str] = None, slots: Optional[int] = None
+) -> None:
+    worker_id = (
+        worker_id
+        or settings.agent_worker_id
+        or f"{socket.gethostname()}-{os.getpid()}"
+    )
+    slots = slots or settings.agent_slots
+    client = AgentClient(server_url, settings.dispatch_token)
+    logger.info(
+        "Agent %s 已启动  server=%s  slots=%d  mock=%s",
+        worker_id, server_url, slots, settings.mock_mode,
+    )
+    session_pool.start()
+    # 同一 agent 的多个槽位共享 worker_id，主服务按 agent 汇总计数
+    try:
+        await asyncio.gather(*(_slot_loop(client, worker_id) for _ in range(slots)))
+    finally:
+        await session_pool.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="FactSage Ca worker agent")
+    ap.add_argument("server_url", nargs="?", default=settings.agent_server_url)
+    ap.add_argument("--worker-id")
+    ap.add_argument("--slots", type=int)
+    args = ap.parse_args(argv)
+    if not args.server_url:
+        ap.error("需指定主服务地址（参数或 agent.server_url）")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    try:
+        asyncio.run(run_agent(args.server_url, args.worker_id, args.slots))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
 # -*- coding: utf-8 -*-
-"""应用配置 —— 从 config.json 加载，支持环境变量覆盖"""
+"""应用配置 —— 从 config.json 加载，支持环境变量覆盖
+
+配置在加载时一次性解析为不可变快照（路径解析、环境变量、mock 自动检测
+都在此完成），运行期读取只是属性访问。reload() 重新解析并原子替换快照，
+可由 /api/config/reload 或 reload.watch_seconds 文件监视触发。
+
+RESTART_ONLY 中的配置在启动时绑定（数据库连接、归档目录、监听地址、
+调度模式），reload 时沿用旧值并记录警告，重启后生效。
+"""
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import importlib.util
 import json
+import logging
 import os
 import sys
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # ── 基准目录 ──────────────────────────────────────────
 # 打包模式 (PyInstaller): exe 所在目录
@@ -18,12 +31,17 @@ _BASE_DIR = (
     else Path(__file__).resolve().parent.parent
 )
 
+logger = logging.getLogger(__name__)
+
 _DEFAULT_CONFIG: Dict[str, Any] = {
-    "server": {"host": "127.0.0.1", "port": 8000},
+    "server": {"host": "127.0.0.1", "port": 8000, "workers": 1},
     "factsage": {
         "dir": r"C:\FactSage",
         "exe_name": "EquiSage.exe",
         "timeout_seconds": 300,
+        "runner": "oneshot",
+        "session_recycle_jobs": 500,
+        "session_idle_seconds": 600,
     },
     "paths": {
         "work_root": "./work",
@@ -32,6 +50,39 @@ _DEFAULT_CONFIG: Dict[str, Any] = {
         "frontend_dir": "frontend" if _IS_FROZEN else "../frontend",
     },
     "mock": {"enabled": "auto", "delay_seconds": 1.5},
+    "dispatch": {
+        "local_slots": 1,
+        "lease_seconds": 60,
+        "max_attempts": 3,
+        "token": "",
+    },
+    "agent": {"server_url": "", "worker_id": "", "slots": 1, "wait_seconds": 20},
+    "admin": {"token": ""},
+    "archive": {
+        "enabled": "auto",
+        "dir": "./archive",
+        "flush_rows": 200,
+        "flush_seconds": 60,
+    },
+    "scratch": {"dir": "", "keep_raw": False},
+    "idempotency": {"ttl_seconds": 86400},
+    "jobs": {"resident": 2000, "max_records": 20000},
+    "scheduler": {"mode": "embedded", "poll_seconds": 0.2},
+    "autotune": {
+        "enabled": False,
+        "min_slots": 1,
+        "max_slots": 0,
+        "window_seconds": 30,
+        "tolerance": 0.05,
+        "hold_windows": 10,
+    },
+    "reload": {"watch_seconds": 0},
+    "recording": {
+        "enabled": False,
+        "dir": "",
+        "max_bytes": 50 * 1024 * 1024,
+        "backup_count": 10,
+    },
 }
 
 
@@ -46,90 +97,293 @@ def _deep_merge(base: dict, override: dict) -> dict:
     return merged
 
 
-class Settings:
-    """全局配置：config.json → 环境变量 → 自动检测"""
+def _resolve(raw: str) -> Path:
+    """相对路径基于 _BASE_DIR 解析，绝对路径原样返回"""
+    p = Path(os.path.expandvars(raw))
+    return p if p.is_absolute() else (_BASE_DIR / p).resolve()
 
-    def __init__(self, config_path: Path | None = None) -> None:
-        cfg_path = config_path or _BASE_DIR / "config.json"
-        if cfg_path.exists():
-            with open(cfg_path, "r", encoding="utf-8") as f:
-                user_cfg = json.load(f)
-        else:
-            user_cfg = {}
-        self._cfg = _deep_merge(_DEFAULT_CONFIG, user_cfg)
 
-    # ── 路径解析 ──────────────────────────────────────────
+def _flag(val: Any, auto: Callable[[], bool]) -> bool:
+    """true/false/auto 开关；auto 时调用探测函数"""
+    if isinstance(val, bool):
+        return val
+    val = str(val).lower()
+    if val == "auto":
+        return auto()
+    return val in ("1", "true", "yes")
 
-    def _resolve(self, raw: str) -> Path:
-        """相对路径基于 _BASE_DIR 解析，绝对路径原样返回"""
-        p = Path(os.path.expandvars(raw))
-        return p if p.is_absolute() else (_BASE_DIR / p).resolve()
 
-    # ── FactSage ──────────────────────────────────────────
+def _scratch_dir(raw: str) -> Optional[Path]:
+    """scratch.dir：空 = 不启用；auto = Linux 下使用 /dev/shm（tmpfs）；
+    其他值为 RAM 盘路径（如 Windows 上 ImDisk 挂载的 R:\\）"""
+    if not raw:
+        return None
+    if str(raw).lower() == "auto":
+        shm = Path("/dev/shm")
+        return shm / "factsage_ca" if shm.is_dir() else None
+    return _resolve(raw)
 
-    @property
-    def factsage_dir(self) -> Path:
-        return Path(os.getenv("FACTSAGE_DIR") or self._cfg["factsage"]["dir"])
 
-    @property
-    def factsage_exe(self) -> Path:
-        return self.factsage_dir / self._cfg["factsage"]["exe_name"]
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """某一时刻完全解析后的配置（不可变）"""
 
-    @property
-    def factsage_timeout(self) -> int:
-        return int(self._cfg["factsage"]["timeout_seconds"])
+    # FactSage
+    factsage_dir: Path
+    factsage_exe: Path
+    factsage_timeout: int
+    # oneshot = 每个任务启动一次 EquiSage；session = 常驻进程经 spool 目录取任务
+    factsage_runner: str
+    session_recycle_jobs: int
+    session_idle_seconds: float
+    # 路径
+    work_root: Path
+    templates_dir: Path
+    presets_dir: Path
+    frontend_dir: Path
+    # 服务器
+    server_host: str
+    server_port: int
+    server_workers: int
+    # Mock
+    mock_mode: bool
+    mock_delay: float
+    # 调度：local_slots = 本机并行执行槽位数；0 = 纯调度节点，任务全部交给远程 agent
+    local_slots: int
+    lease_seconds: float
+    max_attempts: int
+    dispatch_token: str
+    # 管理操作（重新加载配置）令牌：为空时管理接口仅限本机访问
+    admin_token: str
+    # Worker Agent
+    agent_server_url: str
+    agent_worker_id: str
+    agent_slots: int
+    agent_wait_seconds: float
+    # 结果归档：archive.enabled = auto 时已安装 pyarrow 即启用
+    archive_enabled: bool
+    archive_dir: Path
+    archive_flush_rows: int
+    archive_flush_seconds: float
+    # 运行时临时区：None = 直接在 work_root 下运行
+    scratch_dir: Optional[Path]
+    scratch_keep_raw: bool
+    # 幂等键
+    idempotency_ttl: float
+    # 任务记录：resident = 保留完整请求 / 结果的任务数；max_records = 内存中的任务记录数
+    jobs_resident: int
+    jobs_max_records: int
+    # 调度：embedded = API 进程内调度；external = 独立调度进程 + jobs.db 共享队列
+    scheduler_mode: str
+    scheduler_poll_seconds: float
+    # 本机槽位自动调优：max_slots = 0 时取 CPU 核数；local_slots 为起始值
+    autotune_enabled: bool
+    autotune_min_slots: int
+    autotune_max_slots: int
+    autotune_window_seconds: float
+    autotune_tolerance: float
+    autotune_hold_windows: int
+    # 请求录制：dir 为空时使用 work_root/_recordings
+    recording_enabled: bool
+    recording_dir: Path
+    recording_max_bytes: int
+    recording_backup_count: int
+    # 配置热加载
+    config_path: Path
+    config_mtime: float
+    watch_seconds: float
 
-    # ── 路径 ──────────────────────────────────────────────
 
-    @property
-    def work_root(self) -> Path:
-        return self._resolve(
-            os.getenv("WORK_ROOT") or self._cfg["paths"]["work_root"]
-        )
+def load_snapshot(config_path: Path) -> ConfigSnapshot:
+    """config.json → 环境变量 → 自动检测，解析为快照"""
+    mtime = 0.0
+    if config_path.exists():
+        mtime = config_path.stat().st_mtime
+        with open(config_path, "r", encoding="utf-8") as f:
+            user_cfg = json.load(f)
+    else:
+        user_cfg = {}
+    cfg = _deep_merge(_DEFAULT_CONFIG, user_cfg)
+    env = os.getenv
 
-    @property
-    def templates_dir(self) -> Path:
-        return self._resolve(
-            os.getenv("TEMPLATES_DIR") or self._cfg["paths"]["templates_dir"]
-        )
+    fs, paths, mock = cfg["factsage"], cfg["paths"], cfg["mock"]
+    dispatch, agent, archive = cfg["dispatch"], cfg["agent"], cfg["archive"]
+    recording, autotune = cfg["recording"], cfg["autotune"]
+    scheduler_mode = (env("SCHEDULER_MODE") or cfg["scheduler"]["mode"]).lower()
+    if scheduler_mode not in ("embedded", "external"):
+        raise ValueError(f"scheduler.mode 须为 embedded 或 external: {scheduler_mode}")
+    work_root = _resolve(env("WORK_ROOT") or paths["work_root"])
+    autotune_min = max(1, int(autotune["min_slots"]))
+    autotune_max = max(
+        autotune_min, int(autotune["max_slots"]) or os.cpu_count() or 1
+    )
 
-    @property
-    def presets_dir(self) -> Path:
-        return self._resolve(
-            os.getenv("PRESETS_DIR") or self._cfg["paths"]["presets_dir"]
-        )
+    factsage_dir = Path(env("FACTSAGE_DIR") or fs["dir"])
+    factsage_exe = factsage_dir / fs["exe_name"]
+    runner = (env("FACTSAGE_RUNNER") or fs["runner"]).lower()
+    if runner not in ("oneshot", "session"):
+        raise ValueError(f"factsage.runner 须为 oneshot 或 session: {runner}")
 
-    @property
-    def frontend_dir(self) -> Path:
-        return self._resolve(
-            os.getenv("FRONTEND_DIR") or self._cfg["paths"]["frontend_dir"]
-        )
+    return ConfigSnapshot(
+        factsage_dir=factsage_dir,
+        factsage_exe=factsage_exe,
+        factsage_timeout=int(fs["timeout_seconds"]),
+        factsage_runner=runner,
+        session_recycle_jobs=int(fs["session_recycle_jobs"]),
+        session_idle_seconds=float(fs["session_idle_seconds"]),
+        work_root=work_root,
+        templates_dir=_resolve(env("TEMPLATES_DIR") or paths["templates_dir"]),
+        presets_dir=_resolve(env("PRESETS_DIR") or paths["presets_dir"]),
+        frontend_dir=_resolve(env("FRONTEND_DIR") or paths["frontend_dir"]),
+        server_host=env("HOST") or cfg["server"]["host"],
+        server_port=int(env("PORT") or cfg["server"]["port"]),
+        server_workers=int(env("SERVER_WORKERS") or cfg["server"]["workers"]),
+        mock_mode=_flag(
+            env("MOCK_MODE") or mock["enabled"], lambda: not factsage_exe.exists()
+        ),
+        mock_delay=float(env("MOCK_DELAY") or mock["delay_seconds"]),
+        local_slots=int(env("LOCAL_SLOTS") or dispatch["local_slots"]),
+        lease_seconds=float(dispatch["lease_seconds"]),
+        max_attempts=int(dispatch["max_attempts"]),
+        dispatch_token=env("DISPATCH_TOKEN") or dispatch["token"],
+        admin_token=env("ADMIN_TOKEN") or cfg["admin"]["token"],
+        agent_server_url=env("AGENT_SERVER_URL") or agent["server_url"],
+        agent_worker_id=env("AGENT_WORKER_ID") or agent["worker_id"],
+        agent_slots=int(env("AGENT_SLOTS") or agent["slots"]),
+        agent_wait_seconds=float(agent["wait_seconds"]),
+        archive_enabled=_flag(
+            env("ARCHIVE_ENABLED") or archive["enabled"],
+            lambda: importlib.util.find_spec("pyarrow") is not None,
+        ),
+        archive_dir=_resolve(env("ARCHIVE_DIR") or archive["dir"]),
+        archive_flush_rows=int(archive["flush_rows"]),
+        archive_flush_seconds=float(archive["flush_seconds"]),
+        scratch_dir=_scratch_dir(env("SCRATCH_DIR") or cfg["scratch"]["dir"]),
+        scratch_keep_raw=_flag(cfg["scratch"]["keep_raw"], lambda: False),
+        idempotency_ttl=float(cfg["idempotency"]["ttl_seconds"]),
+        jobs_resident=int(cfg["jobs"]["resident"]),
+        jobs_max_records=int(cfg["jobs"]["max_records"]),
+        scheduler_mode=scheduler_mode,
+        scheduler_poll_seconds=float(cfg["scheduler"]["poll_seconds"]),
+        autotune_enabled=_flag(
+            env("AUTOTUNE_ENABLED") or autotune["enabled"], lambda: False
+        ),
+        autotune_min_slots=autotune_min,
+        autotune_max_slots=autotune_max,
+        autotune_window_seconds=float(autotune["window_seconds"]),
+        autotune_tolerance=float(autotune["tolerance"]),
+        autotune_hold_windows=int(autotune["hold_windows"]),
+        recording_enabled=_flag(
+            env("RECORDING_ENABLED") or recording["enabled"], lambda: False
+        ),
+        recording_dir=(
+            _resolve(recording["dir"]) if recording["dir"]
+            else work_root / "_recordings"
+        ),
+        recording_max_bytes=int(recording["max_bytes"]),
+        recording_backup_count=int(recording["backup_count"]),
+        config_path=config_path,
+        config_mtime=mtime,
+        watch_seconds=float(cfg["reload"]["watch_seconds"]),
+    )
 
-    # ── 服务器 ────────────────────────────────────────────
 
-    @property
-    def server_host(self) -> str:
-        return os.getenv("HOST") or self._cfg["server"]["host"]
+ReloadListener = Callable[[ConfigSnapshot, ConfigSnapshot], None]
 
-    @property
-    def server_port(self) -> int:
-        return int(os.getenv("PORT") or self._cfg["server"]["port"])
+# 运行期不能切换的配置：jobs.db / idempotency.db 连接与归档目录随 work_root /
+# archive_dir 打开，监听地址、进程数、调度模式与前端挂载在启动时确定
+RESTART_ONLY = (
+    "work_root", "archive_dir", "frontend_dir", "scheduler_mode",
+    "server_host", "server_port", "server_workers",
+)
 
-    # ── Mock ──────────────────────────────────────────────
 
-    @property
-    def mock_mode(self) -> bool:
-        val = os.getenv("MOCK_MODE") or self._cfg["mock"]["enabled"]
-        if isinstance(val, bool):
-            return val
-        val = str(val).lower()
-        if val == "auto":
-            return not self.factsage_exe.exists()
-        return val in ("1", "true", "yes")
+class Settings:
+    """全局配置入口：持有当前快照，属性访问直接转发到快照
+
+    一次处理中需要多项配置保持一致时，先取 settings.snapshot 再读取。
+    """
+
+    def __init__(self, config_path: Path | None = None) -> None:
+        self._path = config_path or _BASE_DIR / "config.json"
+        self._snap = load_snapshot(self._path)
+        self._listeners: List[ReloadListener] = []
+        self._failed_mtime = 0.0
+        self._watcher: Optional[asyncio.Task] = None
+        self._watch_wanted = False
+        # 已修改但需重启才生效的配置项 {字段: 新值}
+        self.restart_pending: Dict[str, Any] = {}
 
     @property
-    def mock_delay(self) -> float:
-        return float(self._cfg["mock"]["delay_seconds"])
+    def snapshot(self) -> ConfigSnapshot:
+        return self._snap
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._snap, name)
+
+    # ── 热加载 ────────────────────────────────────────────
+
+    def on_reload(self, listener: ReloadListener) -> None:
+        """注册快照替换后的回调 (old, new)"""
+        self._listeners.append(listener)
+
+    def reload(self) -> Dict[str, Tuple[Any, Any]]:
+        """重新解析配置并原子替换快照，返回已生效的变化项 {字段: (旧值, 新值)}
+
+        RESTART_ONLY 中的字段保留旧值，新值记入 restart_pending。
+        解析失败时保留原快照并抛出异常。
+        """
+        new = load_snapshot(self._path)
+        old = self._snap
+        pinned = {k: getattr(old, k) for k in RESTART_ONLY if getattr(new, k) != getattr(old, k)}
+        if pinned:
+            self.restart_pending.update({k: getattr(new, k) for k in pinned})
+            logger.warning("以下配置变更需重启后生效: %s", ", ".join(pinned))
+            new = dataclasses.replace(new, **pinned)
+        self._snap = new
+        changes = {
+            f.name: (getattr(old, f.name), getattr(new, f.name))
+            for f in dataclasses.fields(ConfigSnapshot)
+            if f.name != "config_mtime"
+            and getattr(old, f.name) != getattr(new, f.name)
+        }
+        if changes:
+            logger.info("配置已重新加载, 变化: %s", ", ".join(changes))
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception:
+                logger.error("配置变更回调失败", exc_info=True)
+        if self._watch_wanted:
+            # 经 reload 把 watch_seconds 从 0 改为正数时在此启动监视
+            self.start_watch()
+        return changes
+
+    def start_watch(self) -> None:
+        """在运行中的事件循环里启动文件监视；watch_seconds=0 时等到 reload 改为正数再启动"""
+        self._watch_wanted = True
+        if self._snap.watch_seconds > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.get_running_loop().create_task(self.watch())
+
+    def stop_watch(self) -> None:
+        self._watch_wanted = False
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def watch(self) -> None:
+        """轮询 config.json 修改时间，变化时自动 reload（watch_seconds 改为 0 时退出）"""
+        while self._snap.watch_seconds > 0:
+            await asyncio.sleep(self._snap.watch_seconds)
+            mtime = self._path.stat().st_mtime if self._path.exists() else 0.0
+            if mtime in (self._snap.config_mtime, self._failed_mtime):
+                continue
+            try:
+                self.reload()
+            except Exception:
+                # 同一版本的坏文件只报一次，修正后再次保存即可重试
+                self._failed_mtime = mtime
+                logger.error("config.json 重新加载失败，沿用当前配置", exc_info=True)
 
 
 settings = Settings()
@@ -9,12 +9,19 @@ from pathlib import Path
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
 from .config import settings
-from .routers import jobs
+from .routers import agents, analytics, bulk, compare, jobs, studies
+from .services.equisage_session import session_pool
+from .services.http_cache import CachedPage, FingerprintedStaticFiles, fingerprint_html
+from .services.idempotency import idempotency_store
 from .services.job_manager import job_manager
+from .services.job_store import job_store
+from .services.recording import RecordingMiddleware, recorder
+from .services.result_archive import result_archive
+from .services.studies import study_manager
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,9 +35,20 @@ async def lifespan(app: FastAPI):
     logger.info(
         "启动 FactSage Ca 用量估算服务  mock=%s", settings.mock_mode
     )
+    await result_archive.start(compact=settings.scheduler_mode == "embedded")
     await job_manager.start()
+    study_manager.start()
+    session_pool.start()
+    settings.start_watch()
     yield
+    settings.stop_watch()
+    await study_manager.stop()
     await job_manager.stop()
+    await session_pool.stop()
+    await result_archive.stop()
+    idempotency_store.close()
+    job_store.close()
+    recorder.close()
 
 
 app = FastAPI(
@@ -48,6 +66,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求录制（recording.enabled，供 benchmarks/replay.py 重放）
+app.add_middleware(RecordingMiddleware)
+
+# 响应压缩：安装了 brotli-asgi 时优先 br（自动回退 gzip），否则仅 gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+
+    app.add_middleware(BrotliMiddleware, minimum_size=500)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
 # 验证异常处理：记录详细错误信息
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -57,15 +86,28 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 # 注册 API 路由
 app.include_router(jobs.router)
+app.include_router(agents.router)
+app.include_router(bulk.router)
+app.include_router(analytics.router)
+app.include_router(compare.router)
+app.include_router(studies.router)
 
 # 挂载前端静态资源
 _FE = settings.frontend_dir
 if _FE.exists():
-    app.mount("/css", StaticFiles(directory=_FE / "css"), name="css")
-    app.mount("/js", StaticFiles(directory=_FE / "js"), name="js")
+    # 静态资源按内容指纹引用：指纹匹配时长期缓存，内容变化即换 URL
+    _static = {
+        name: FingerprintedStaticFiles(directory=_FE / name)
+        for name in ("css", "js")
+    }
+    for _name, _files in _static.items():
+        app.mount(f"/{_name}", _files, name=_name)
+    _index = CachedPage(
+        fingerprint_html((_FE / "index.html").read_text(encoding="utf-8"), _static)
+    )
 
     @app.get("/")
-    async def index():
-        return FileResponse(_FE / "index.html")
+    async def index(request: Request):
+        return _index.response(request.headers)
 else:
     logger.warning("前端目录不存在: %s，仅提供 API 服务", _FE)
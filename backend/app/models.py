@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -96,6 +96,9 @@ class JobResponse(BaseModel):
     status: JobStatus
     calc_type: Optional[CalcType] = None
     created_at: Optional[str] = None
+    worker: Optional[str] = None
+    queue_seconds: Optional[float] = Field(None, description="入队到开始执行 (s)")
+    run_seconds: Optional[float] = Field(None, description="开始执行到结束 (s)")
     result: Optional[CalculationResult] = None
     error: Optional[str] = None
 
@@ -105,3 +108,117 @@ class JobListItem(BaseModel):
     status: JobStatus
     calc_type: CalcType
     created_at: str
+
+
+# ─── 批量导入 ────────────────────────────────────────────
+
+class ImportRowError(BaseModel):
+    row: int = Field(..., description="表格行号（含表头，从 1 起）")
+    errors: List[str]
+
+
+class ImportResponse(BaseModel):
+    group_id: Optional[str] = None
+    submitted: int
+    job_ids: List[str] = Field(default_factory=list)
+    errors: List[ImportRowError] = Field(default_factory=list)
+
+
+class GroupSummary(BaseModel):
+    group_id: str
+    total: int
+    pending: int
+    running: int
+    completed: int
+    failed: int
+
+
+# ─── 多任务对比 ──────────────────────────────────────────
+
+class CompareRequest(BaseModel):
+    job_ids: Optional[List[str]] = Field(None, description="指定任务；为空时按过滤条件选取")
+    group_id: Optional[str] = Field(None, description="按任务组过滤")
+    calc_type: Optional[CalcType] = None
+    created_from: Optional[str] = Field(None, description="ISO 时间下限（含）")
+    created_to: Optional[str] = Field(None, description="ISO 时间上限（含）")
+    limit: int = Field(50, ge=2, le=500, description="按过滤条件选取时的最大任务数")
+    reference: Optional[str] = Field(None, description="参照任务，默认取第一个")
+
+
+# ─── 研究任务（多点评估） ────────────────────────────────
+
+class SensitivityRequest(BaseModel):
+    base: JobRequest = Field(..., description="基准炉次")
+    variables: List[str] = Field(
+        default_factory=lambda: ["O_g", "S_g", "Al2O3_g", "T_C"],
+        min_length=1,
+        description="求偏导的输入列（见 columns.NUMERIC_INPUT_COLUMNS）",
+    )
+    outputs: List[str] = Field(
+        default_factory=lambda: ["alpha_Ca_g"], min_length=1, description="结果列"
+    )
+    rel_step: float = Field(0.05, gt=0, le=0.5, description="初始相对步长")
+    steps: Dict[str, float] = Field(
+        default_factory=dict, description="按列指定的初始绝对步长（基准值为 0 时必填）"
+    )
+    tolerance: float = Field(0.05, gt=0, description="h 与 h/2 估计的相对偏差上限")
+    max_refinements: int = Field(2, ge=0, le=5, description="超差时步长减半的最多次数")
+
+
+class OptimizeRequest(BaseModel):
+    base: JobRequest = Field(..., description="基准炉次（calc_type 与 target 由约束决定）")
+    al_min: Optional[float] = Field(None, gt=0, description="Al 窗口下限 (wt%)")
+    al_max: Optional[float] = Field(None, gt=0, description="Al 窗口上限 (wt%)")
+    s_max: Optional[float] = Field(None, gt=0, description="S 上限 (wt%)")
+    free: Dict[str, List[float]] = Field(
+        default_factory=dict,
+        description='自由变量及取值范围，如 {"CaO_g": [20, 60]}；为空时只评估基准炉次',
+    )
+    initial_step: float = Field(0.25, gt=0, le=1, description="初始步长（占取值范围的比例）")
+    min_step: float = Field(0.02, gt=0, le=1, description="步长小于该比例时停止")
+    max_iterations: int = Field(30, ge=1, le=200, description="模式搜索最多迭代次数")
+
+
+class StudyResponse(BaseModel):
+    study_id: str
+    kind: str
+    status: JobStatus
+    created_at: str
+    evaluations: int = Field(0, description="提交的 FactSage 计算次数")
+    reused: int = Field(0, description="命中已有计算结果的次数")
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+# ─── 远程 Worker Agent ───────────────────────────────────
+
+class LeaseRequest(BaseModel):
+    worker_id: str = Field(..., min_length=1, description="agent 标识")
+    wait_seconds: float = Field(0, ge=0, le=60, description="无任务时最长等待 (s)")
+
+
+class LeaseResponse(BaseModel):
+    job_id: str
+    lease_id: str
+    lease_seconds: float
+    request: JobRequest
+
+
+class LeaseRef(BaseModel):
+    lease_id: str
+
+
+class LeaseComplete(LeaseRef):
+    result: CalculationResult
+
+
+class LeaseFail(LeaseRef):
+    error: str
+
+
+class AgentInfo(BaseModel):
+    worker_id: str
+    last_seen: str
+    running: int
+    completed: int
+    failed: int
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""API 路由：远程 worker agent 租约 / 续约 / 回传结果"""
+from __future__ import annotations
+
+import hmac
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+
+from ..config import settings
+from ..models import (
+    AgentInfo,
+    LeaseComplete,
+    LeaseFail,
+    LeaseRef,
+    LeaseRequest,
+    LeaseResponse,
+)
+from ..services.job_manager import job_manager
+
+logger = logging.getLogger(__name__)
+
+
+def _check_token(x_agent_token: Optional[str] = Header(None)) -> None:
+    """配置了 dispatch.token 时要求 agent 携带相同的 X-Agent-Token"""
+    expected = settings.dispatch_token
+    if expected and not hmac.compare_digest(x_agent_token or "", expected):
+        raise HTTPException(status_code=401, detail="agent 令牌无效")
+
+
+router = APIRouter(
+    prefix="/api/agents", tags=["agents"], dependencies=[Depends(_check_token)]
+)
+
+_LEASE_LOST = "租约已失效（已超时回收或任务不存在）"
+
+
+@router.post("/lease", response_model=Optional[LeaseResponse])
+async def lease(body: LeaseRequest):
+    """租用一个待执行任务；等待超时仍无任务时返回 204"""
+    job = await job_manager.lease(body.worker_id, body.wait_seconds)
+    if not job:
+        return Response(status_code=204)
+    return LeaseResponse(
+        job_id=job.job_id,
+        lease_id=job.lease_id,
+        lease_seconds=settings.lease_seconds,
+        request=job.request,
+    )
+
+
+@router.post("/jobs/{job_id}/heartbeat")
+async def heartbeat(job_id: str, body: LeaseRef):
+    """续约"""
+    if not job_manager.heartbeat(job_id, body.lease_id):
+        raise HTTPException(status_code=409, detail=_LEASE_LOST)
+    return {"lease_seconds": settings.lease_seconds}
+
+
+@router.post("/jobs/{job_id}/complete")
+async def complete(job_id: str, body: LeaseComplete):
+    """回传解析后的计算结果"""
+    if not job_manager.complete(job_id, body.lease_id, body.result):
+        raise HTTPException(status_code=409, detail=_LEASE_LOST)
+    return {"ok": True}
+
+
+@router.post("/jobs/{job_id}/fail")
+async def fail(job_id: str, body: LeaseFail):
+    """回报执行失败"""
+    if not job_manager.fail(job_id, body.lease_id, body.error):
+        raise HTTPException(status_code=409, detail=_LEASE_LOST)
+    return {"ok": True}
+
+
+@router.get("")
+async def list_agents() -> List[AgentInfo]:
+    """列出连接过的 agent 及其计数"""
+    return [AgentInfo(**a) for a in job_manager.agents()]
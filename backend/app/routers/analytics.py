@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""API 路由：基于列式归档的聚合查询（不读取 work 目录）"""
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..services.result_archive import (
+    AGGREGATES,
+    NUMERIC_COLUMNS,
+    STRING_COLUMNS,
+    result_archive,
+)
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+
+def _require_archive() -> None:
+    if not result_archive.enabled:
+        raise HTTPException(
+            status_code=503, detail="结果归档未启用（需安装 pyarrow 并开启 archive.enabled）"
+        )
+
+
+def _parse_range(raw: str):
+    """col:lo:hi，lo / hi 可留空"""
+    parts = raw.split(":")
+    if len(parts) != 3:
+        raise ValueError(f"过滤条件格式应为 列:下限:上限 — {raw}")
+    col, lo, hi = parts
+    return col, float(lo) if lo else None, float(hi) if hi else None
+
+
+@router.get("/columns")
+async def columns():
+    """可用于查询的列与聚合方式"""
+    _require_archive()
+    return {
+        "numeric": NUMERIC_COLUMNS,
+        "categorical": STRING_COLUMNS,
+        "aggregates": list(AGGREGATES),
+    }
+
+
+@router.get("/query")
+async def query(
+    metrics: str = Query("alpha_Ca_g", description="逗号分隔的数值列"),
+    agg: str = Query("mean"),
+    group_by: Optional[str] = Query(None, description="分组列，如 T_C / calc_type"),
+    bin: Optional[float] = Query(None, description="数值分组列的分段宽度，如 25 (°C)"),
+    calc_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    filter: List[str] = Query([], description="数值范围过滤 列:下限:上限，可重复"),
+):
+    """过滤聚合，例如按 25 °C 温度段统计平均 Ca 用量::
+
+        /api/analytics/query?metrics=alpha_Ca_g&group_by=T_C&bin=25
+    """
+    _require_archive()
+    metric_list = [m.strip() for m in metrics.split(",") if m.strip()]
+    if not metric_list:
+        raise HTTPException(status_code=400, detail="至少指定一个 metrics 列")
+    try:
+        ranges = [_parse_range(f) for f in filter]
+        out = await asyncio.to_thread(
+            result_archive.query,
+            metric_list, agg, group_by, bin, calc_type, date_from, date_to, ranges,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"metrics": metric_list, "agg": agg, "group_by": group_by, "bin": bin, **out}
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""API 路由：批量导入炉次 / 任务组进度 / 流式导出结果"""
+from __future__ import annotations
+
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ..models import GroupSummary, ImportResponse, JobStatus
+from ..services.bulk_io import iter_group_csv, parse_import
+from ..services.job_manager import job_manager
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["bulk"])
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail="文件过大（上限 10 MB）")
+
+
+async def _read_capped(request: Request) -> bytes:
+    """读取请求体；声明长度或实际读取量超过上限时立即拒绝，不缓冲整个上传"""
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            length = int(declared)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Content-Length 无效")
+        if length > MAX_UPLOAD_BYTES:
+            raise _too_large()
+    # 分块传输时没有 Content-Length，按实际读取量截断
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf += chunk
+        if len(buf) > MAX_UPLOAD_BYTES:
+            raise _too_large()
+    return bytes(buf)
+
+
+@router.post("/import")
+async def import_table(
+    request: Request,
+    filename: str = Query("upload.csv", description="原文件名（据扩展名识别 CSV / XLSX）"),
+    strict: bool = Query(False, description="存在错误行时整批不提交"),
+) -> ImportResponse:
+    """上传 CSV / XLSX（请求体为文件原始内容），逐行校验后作为一个任务组提交"""
+    data = await _read_capped(request)
+    if not data:
+        raise HTTPException(status_code=400, detail="上传内容为空")
+    try:
+        accepted, errors = parse_import(data, filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if errors:
+        logger.warning("导入 %s: %d 行校验失败", filename, len(errors))
+    if (strict and errors) or not accepted:
+        body = ImportResponse(submitted=0, errors=errors)
+        return JSONResponse(status_code=422, content=body.model_dump())
+
+    group_id, job_ids = await job_manager.submit_group(
+        [req for req, _ in accepted], [label for _, label in accepted]
+    )
+    return ImportResponse(
+        group_id=group_id, submitted=len(job_ids), job_ids=job_ids, errors=errors
+    )
+
+
+def _group_or_404(group_id: str):
+    job_ids = job_manager.group(group_id)
+    if job_ids is None:
+        raise HTTPException(status_code=404, detail="任务组不存在")
+    return job_ids
+
+
+@router.get("/groups/{group_id}")
+async def group_summary(group_id: str) -> GroupSummary:
+    """任务组进度"""
+    job_ids = _group_or_404(group_id)
+    counts = {s: 0 for s in JobStatus}
+    for jid in job_ids:
+        counts[job_manager.get(jid).status] += 1
+    return GroupSummary(
+        group_id=group_id,
+        total=len(job_ids),
+        **{s.value: n for s, n in counts.items()},
+    )
+
+
+@router.get("/groups/{group_id}/export.csv")
+async def export_group(group_id: str):
+    """流式导出任务组结果：已完成的立即输出，其余完成一条输出一条"""
+    job_ids = _group_or_404(group_id)
+    return StreamingResponse(
+        iter_group_csv(list(job_ids)),
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="group_{group_id}.csv"'
+        },
+    )
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""API 路由：多炉次对比"""
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+
+from ..models import CompareRequest, JobStatus
+from ..services.comparison import compare_jobs
+from ..services.job_manager import job_manager
+
+router = APIRouter(prefix="/api", tags=["compare"])
+
+
+def _select(body: CompareRequest):
+    """按 job_ids 或过滤条件选取任务，返回 (已完成任务, 跳过的 job_id)"""
+    if body.job_ids:
+        candidates = []
+        for jid in dict.fromkeys(body.job_ids):
+            job = job_manager.get(jid)
+            if not job:
+                raise HTTPException(status_code=404, detail=f"任务 {jid} 不存在")
+            candidates.append(job)
+    elif body.group_id:
+        ids = job_manager.group(body.group_id)
+        if ids is None:
+            raise HTTPException(status_code=404, detail="任务组不存在")
+        candidates = [
+            j for j in (job_manager.get(jid) for jid in ids)
+            if (not body.calc_type or j.calc_type == body.calc_type)
+            and (not body.created_from or j.created_at >= body.created_from)
+            and (not body.created_to or j.created_at <= body.created_to)
+            and j.status == JobStatus.completed
+        ][: body.limit]
+    else:
+        # 历史任务的过滤在 jobs.db 内完成，只取回 limit 条
+        candidates = job_manager.list_all(
+            body.limit,
+            status=JobStatus.completed,
+            calc_type=body.calc_type,
+            created_from=body.created_from,
+            created_to=body.created_to,
+        )
+
+    done = [j for j in candidates if j.status == JobStatus.completed]
+    skipped = [j.job_id for j in candidates if j.status != JobStatus.completed]
+    return done, skipped
+
+
+@router.post("/compare")
+async def compare(body: CompareRequest):
+    """返回对齐的输入 / 结果矩阵、相对参照的差值及 Ca 差异的主要驱动输入"""
+    jobs, skipped = _select(body)
+    try:
+        out = compare_jobs(jobs, body.reference)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    out["skipped"] = skipped
+    return out
@@ -2,11 +2,16 @@
 """API 路由：任务提交 / 查询 / 预设"""
 from __future__ import annotations
 
+import asyncio
+import hmac
 import json
 import logging
-from typing import List
+import time
+import uuid
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import Response
 
 from ..config import settings
 from ..models import (
@@ -15,7 +20,15 @@ from ..models import (
     JobResponse,
     JobStatus,
 )
+from ..services.http_cache import IMMUTABLE, REVALIDATE, cached_response, make_etag
+from ..services.idempotency import (
+    MAX_KEY_LENGTH,
+    idempotency_store,
+    request_fingerprint,
+)
+from ..services.equisage_session import session_pool
 from ..services.job_manager import job_manager
+from ..services.job_store import JobRecord
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["jobs"])
@@ -51,45 +64,117 @@ def _load_presets() -> dict:
 
 
 @router.post("/calculate")
-async def calculate(request: JobRequest) -> JobResponse:
-    """提交一次计算任务"""
-    job_id = await job_manager.submit(request)
+async def calculate(
+    request: JobRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+) -> JobResponse:
+    """提交一次计算任务
+
+    携带 Idempotency-Key 时，有效期内以同一个键重复提交相同内容
+    返回原任务（响应头 Idempotent-Replayed: true），不会重复计算。
+    """
+    if idempotency_key is None:
+        job_id = await job_manager.submit(request)
+    else:
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key 长度无效")
+        job_id = await _submit_idempotent(idempotency_key, request, response)
+
     job = job_manager.get(job_id)
     return JobResponse(
         job_id=job_id,
-        status=job["status"],
-        calc_type=job["calc_type"],
-        created_at=job["created_at"],
+        status=job.status,
+        calc_type=job.calc_type,
+        created_at=job.created_at,
     )
 
 
-@router.get("/jobs/{job_id}")
-async def get_job(job_id: str) -> JobResponse:
-    """查询任务状态与结果"""
+# 其他请求已预留键、但任务尚未写入时，等待其提交的最长时间
+_RESERVATION_WAIT_SECONDS = 5.0
+
+
+async def _submit_idempotent(key: str, request: JobRequest, response: Response) -> str:
+    fingerprint = request_fingerprint(request)
+    job_id = uuid.uuid4().hex
+    # 先在库中原子预留键，再提交；并发重试（含其他 API 进程）只有一个能取得键
+    owner, known = idempotency_store.reserve(key, job_id, fingerprint)
+    if owner != job_id:
+        if known != fingerprint:
+            raise HTTPException(
+                status_code=422, detail="Idempotency-Key 已用于内容不同的请求"
+            )
+        deadline = time.monotonic() + _RESERVATION_WAIT_SECONDS
+        while not job_manager.get(owner):
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.05)
+        else:
+            response.headers["Idempotent-Replayed"] = "true"
+            logger.info("幂等键命中，返回已有任务 %s", owner)
+            return owner
+        # 预留者始终没有写入任务（进程已退出）：接管该键
+        if not idempotency_store.takeover(key, owner, job_id):
+            raise HTTPException(
+                status_code=409, detail="同一 Idempotency-Key 的请求正在处理，请稍后重试"
+            )
+    try:
+        return await job_manager.submit(request, job_id=job_id)
+    except BaseException:
+        idempotency_store.release(key, job_id)
+        raise
+
+
+_TERMINAL = (JobStatus.completed, JobStatus.failed)
+
+
+def _encode_job(job: JobRecord) -> Tuple[bytes, str]:
+    """序列化任务响应；终态任务不再变化，序列化结果与 ETag 缓存在任务上"""
+    if job.http_cache:
+        return job.http_cache
+    started, finished = job.started_ts, job.finished_ts
+    body = JobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        calc_type=job.calc_type,
+        created_at=job.created_at,
+        worker=job.worker,
+        queue_seconds=round(started - job.submitted_ts, 3) if started else None,
+        run_seconds=round(finished - started, 3) if started and finished else None,
+        result=job.result,
+        error=job.error,
+    ).model_dump_json().encode("utf-8")
+    encoded = (body, make_etag(body))
+    if job.status in _TERMINAL:
+        job.http_cache = encoded
+    return encoded
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, request: Request) -> Response:
+    """查询任务状态与结果（终态结果可被客户端长期缓存，支持 If-None-Match）"""
     job = job_manager.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="任务不存在")
-    return JobResponse(
-        job_id=job["job_id"],
-        status=job["status"],
-        calc_type=job["calc_type"],
-        created_at=job["created_at"],
-        result=job["result"],
-        error=job["error"],
-    )
+    body, etag = _encode_job(job)
+    cache_control = IMMUTABLE if job.status in _TERMINAL else REVALIDATE
+    return cached_response(body, etag, cache_control, request.headers)
 
 
 @router.get("/jobs")
-async def list_jobs() -> List[JobListItem]:
-    """列出所有任务"""
+async def list_jobs(
+    limit: int = Query(50, ge=1, le=1000, description="每页任务数"),
+    offset: int = Query(0, ge=0, description="跳过最近的前 N 个任务"),
+) -> List[JobListItem]:
+    """按创建时间倒序分页列出任务"""
     return [
         JobListItem(
-            job_id=j["job_id"],
-            status=j["status"],
-            calc_type=j["calc_type"],
-            created_at=j["created_at"],
+            job_id=j.job_id,
+            status=j.status,
+            calc_type=j.calc_type,
+            created_at=j.created_at,
         )
-        for j in job_manager.list_all()
+        for j in job_manager.list_all(limit, offset)
     ]
 
 
@@ -108,6 +193,46 @@ async def get_preset(name: str):
     return presets[name]
 
 
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def _check_admin(request: Request, x_admin_token: Optional[str]) -> None:
+    """管理操作：配置了 admin.token 时须携带相同的 X-Admin-Token，否则仅限本机
+
+    与 agent 的 dispatch.token 分开：能领取计算任务不代表可以改配置。
+    """
+    expected = settings.admin_token
+    if expected:
+        if not hmac.compare_digest(x_admin_token or "", expected):
+            raise HTTPException(status_code=401, detail="管理令牌无效")
+    elif not request.client or request.client.host not in _LOOPBACK_HOSTS:
+        raise HTTPException(
+            status_code=403, detail="未配置 admin.token 时仅允许本机重新加载配置"
+        )
+
+
+@router.post("/config/reload")
+async def reload_config(
+    request: Request, x_admin_token: Optional[str] = Header(None)
+):
+    """重新读取 config.json / 环境变量并原子替换配置快照
+
+    调度、mock、FactSage、模板 / 预设目录等设置即时生效；work_root、
+    archive.dir、监听地址、进程数、调度模式与前端目录需重启（见
+    config.RESTART_ONLY），列在 restart_required 中。只返回配置项名称
+    （值可能包含令牌等机密）。
+    """
+    _check_admin(request, x_admin_token)
+    try:
+        changes = settings.reload()
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"配置重新加载失败: {exc}")
+    return {
+        "changed": sorted(changes),
+        "restart_required": sorted(settings.restart_pending),
+    }
+
+
 @router.get("/config/info")
 async def config_info():
     """返回当前运行模式信息"""
@@ -116,4 +241,9 @@ async def config_info():
         "factsage_dir": str(settings.factsage_dir),
         "templates_dir": str(settings.templates_dir),
         "presets_dir": str(settings.presets_dir),
+        "local_slots": settings.local_slots,
+        "runner": settings.factsage_runner,
+        "scheduler_mode": settings.scheduler_mode,
+        "concurrency": job_manager.concurrency(),
+        "sessions": session_pool.status(),
     }
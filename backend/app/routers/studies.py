@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""API 路由：研究任务（灵敏度分析、约束优化等多点计算）"""
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+
+from ..models import OptimizeRequest, SensitivityRequest, StudyResponse
+from ..services.optimization import plan_optimization, run_optimization
+from ..services.sensitivity import plan_steps, run_sensitivity
+from ..services.studies import study_manager
+
+router = APIRouter(prefix="/api", tags=["studies"])
+
+
+@router.post("/sensitivity", status_code=202)
+async def create_sensitivity(body: SensitivityRequest) -> StudyResponse:
+    """以基准炉次为中心做有限差分，异步返回 Jacobian 与弹性系数"""
+    try:
+        plan_steps(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    study = study_manager.create(
+        "sensitivity", lambda s: run_sensitivity(s, body)
+    )
+    return StudyResponse(**study.to_dict())
+
+
+@router.post("/optimize", status_code=202)
+async def create_optimization(body: OptimizeRequest) -> StudyResponse:
+    """求同时满足 Al 窗口与 S 上限的最小 Ca 用量（可含自由变量），异步返回最优点"""
+    try:
+        plan_optimization(body)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    study = study_manager.create(
+        "optimization", lambda s: run_optimization(s, body)
+    )
+    return StudyResponse(**study.to_dict())
+
+
+@router.get("/studies/{study_id}")
+async def get_study(study_id: str) -> StudyResponse:
+    study = study_manager.get(study_id)
+    if not study:
+        raise HTTPException(status_code=404, detail="研究任务不存在")
+    return StudyResponse(**study)
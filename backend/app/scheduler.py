@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""独立调度进程（scheduler.mode = external）
+
+用法::
+
+    python run.py --scheduler          # 调度进程：本机 FactSage 槽位 + 租约回收
+    python run.py                      # API 进程：server.workers > 1 时多进程服务
+
+API 进程与调度进程使用同一份 config.json，经 work_root/jobs.db 共享任务
+队列；API 进程可以有多个（uvicorn workers），调度进程只能有一个。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from typing import List, Optional
+
+from .config import settings
+from .services.equisage_session import session_pool
+from .services.job_manager import job_manager
+from .services.job_store import job_store
+from .services.result_archive import result_archive
+
+logger = logging.getLogger(__name__)
+
+
+async def run_scheduler() -> None:
+    await result_archive.start()
+    await job_manager.start(scheduler=True)
+    session_pool.start()
+    settings.start_watch()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        settings.stop_watch()
+        await job_manager.stop()
+        await session_pool.stop()
+        await result_archive.stop()
+        job_store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="FactSage Ca 调度进程")
+    ap.parse_args(argv)
+    if settings.scheduler_mode != "external":
+        ap.error("独立调度进程需在 config.json 中设置 scheduler.mode = external")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    logger.info(
+        "调度进程启动  jobs.db=%s  mock=%s",
+        settings.work_root / "jobs.db", settings.mock_mode,
+    )
+    try:
+        asyncio.run(run_scheduler())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""本机槽位自动调优：按实测吞吐在 [min_slots, max_slots] 内调整并发数
+
+并行 EquiSage 进程数的最优值取决于主机（CPU 核数、磁盘、许可证席位），
+超额并发会让每个任务都变慢。调优器以 AIMD 方式逐步逼近吞吐拐点：
+
+  - 统计窗口：至少 window_seconds 秒且完成不少于 2×槽位数 个任务；
+    窗口内槽位利用率低于 80% 说明是需求不足而非并发不足，只丢弃样本；
+  - 每个并发数 n 记录吞吐（EWMA）与平均单任务耗时；
+  - 加性增加：n 的吞吐比 n-1 高出 tolerance 以上 → n+1；
+  - 乘性减少：n 的吞吐比 n-1 低出 tolerance 以上（超额并发）→ ⌊0.75n⌋；
+  - 持平：多出的槽位不再带来收益 → n-1；
+  - 减少后记下劣化点，回升到其下一档时保持 hold_windows 个窗口，之后
+    再向上试探一次，以适应主机负载的变化。
+
+调优器只决定目标槽位数，由 JobManager 调用 _resize() 生效；远程 agent
+的槽位不受影响。
+"""
+from __future__ import annotations
+
+import itertools
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from ..config import settings
+
+# 窗口内槽位利用率低于该值时视为需求不足，不据此调整
+_MIN_UTILIZATION = 0.8
+_DECREASE_FACTOR = 0.75
+_EWMA_ALPHA = 0.5
+
+
+class SlotAutotuner:
+    def __init__(self) -> None:
+        self._running: Dict[int, float] = {}
+        self._tokens = itertools.count()
+        # 并发数 → {"throughput": 任务/分钟, "run_seconds": 平均单任务耗时}
+        self._history: Dict[int, Dict[str, float]] = {}
+        self._last_window: Optional[Dict[str, Any]] = None
+        self._last_change: Optional[str] = None
+        # 最近一次观察到吞吐不再提升的并发数；保持期结束前不再越过
+        self._ceiling: Optional[int] = None
+        self._hold = 0
+        self._reset_window(0)
+
+    def reset(self) -> None:
+        """配置变化时丢弃历史，从当前槽位数重新测量"""
+        self._history = {}
+        self._last_window = None
+        self._last_change = None
+        self._ceiling = None
+        self._hold = 0
+        self._reset_window(0)
+
+    def clamp(self, slots: int) -> int:
+        return min(settings.autotune_max_slots, max(settings.autotune_min_slots, slots))
+
+    # ── 采样 ────────────────────────────────────────────────
+
+    def begin(self) -> int:
+        token = next(self._tokens)
+        self._running[token] = time.monotonic()
+        return token
+
+    def end(self, token: int, completed: bool) -> None:
+        started = self._running.pop(token, None)
+        if started is None:
+            return
+        now = time.monotonic()
+        self._busy += now - max(started, self._window_start)
+        self._run_total += now - started
+        self._finished += 1
+        if completed:
+            self._completed += 1
+
+    # ── 决策 ────────────────────────────────────────────────
+
+    def step(self, slots: int) -> int:
+        """窗口未结束时返回原槽位数；结束时按吞吐变化返回新的目标槽位数"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if (
+            elapsed < settings.autotune_window_seconds
+            or self._finished < 2 * max(slots, 1)
+        ):
+            return slots
+
+        busy = self._busy + sum(
+            now - max(t, self._window_start) for t in self._running.values()
+        )
+        utilization = busy / (slots * elapsed) if slots else 0.0
+        throughput = self._completed / elapsed * 60
+        run_seconds = self._run_total / self._finished
+        self._last_window = {
+            "slots": slots,
+            "throughput_per_min": round(throughput, 3),
+            "run_seconds": round(run_seconds, 3),
+            "utilization": round(min(utilization, 1.0), 3),
+        }
+        self._reset_window(now)
+        if utilization < _MIN_UTILIZATION:
+            return slots
+
+        seen = self._history.get(slots)
+        if seen:
+            throughput = seen["throughput"] + _EWMA_ALPHA * (throughput - seen["throughput"])
+            run_seconds = seen["run_seconds"] + _EWMA_ALPHA * (run_seconds - seen["run_seconds"])
+        self._history[slots] = {
+            "throughput": round(throughput, 3),
+            "run_seconds": round(run_seconds, 3),
+        }
+        return self._decide(slots, throughput)
+
+    def _decide(self, slots: int, throughput: float) -> int:
+        tol = settings.autotune_tolerance
+        lower = self._history.get(slots - 1)
+        if lower and throughput < lower["throughput"] * (1 - tol):
+            self._ceiling = slots
+            target = min(slots - 1, int(slots * _DECREASE_FACTOR))
+            return self._change(slots, target, "吞吐下降，乘性减少")
+        if self._hold > 0:
+            self._hold -= 1
+            if self._hold == 0:
+                self._ceiling = None
+            return slots
+        if lower is None or throughput > lower["throughput"] * (1 + tol):
+            ceiling = self._ceiling or settings.autotune_max_slots + 1
+            if slots + 1 >= ceiling:
+                # 再加一个槽位会回到已知的劣化点（或超出上限）：保持后再试探
+                self._hold = settings.autotune_hold_windows
+                return slots
+            return self._change(slots, slots + 1, "吞吐随并发提升，加性增加")
+        # 持平：退回 n-1 并保持 hold_windows 个窗口，之后重新向上试探
+        self._ceiling = slots
+        self._hold = settings.autotune_hold_windows
+        return self._change(slots, slots - 1, "吞吐持平，回退并保持")
+
+    def _change(self, slots: int, target: int, reason: str) -> int:
+        target = self.clamp(target)
+        if target != slots:
+            self._last_change = f"{slots} -> {target}: {reason}"
+        return target
+
+    def _reset_window(self, now: float) -> None:
+        self._window_start = now or time.monotonic()
+        self._busy = 0.0
+        self._run_total = 0.0
+        self._finished = 0
+        self._completed = 0
+
+    # ── 状态 ────────────────────────────────────────────────
+
+    def status(self, target: int, running: int) -> Dict[str, Any]:
+        return {
+            "autotune": settings.autotune_enabled,
+            "running": running,
+            "target_slots": target,
+            "min_slots": settings.autotune_min_slots,
+            "max_slots": settings.autotune_max_slots,
+            "holding_windows": self._hold,
+            "last_window": self._last_window,
+            "last_change": self._last_change,
+            "history": {str(n): v for n, v in sorted(self._history.items())},
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
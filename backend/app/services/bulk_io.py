@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""批量导入（CSV / XLSX → JobRequest）与流式 CSV 导出"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ..models import ImportRowError, JobRequest
+from .columns import (
+    INPUT_COLUMNS,
+    RESULT_COLUMNS,
+    flatten_request,
+    flatten_result,
+    request_from_row,
+)
+from .job_manager import job_manager
+from .job_store import JobRecord
+
+try:  # XLSX 支持为可选依赖
+    import openpyxl
+except ImportError:  # pragma: no cover
+    openpyxl = None
+
+MAX_ROWS = 5000
+LABEL_COLUMN = "heat_id"
+
+EXPORT_COLUMNS: List[str] = [
+    "row", LABEL_COLUMN, "job_id", "status", "error",
+    *INPUT_COLUMNS, *RESULT_COLUMNS,
+]
+
+
+# ── 读取表格 ──────────────────────────────────────────────
+
+
+def _decode_csv(data: bytes) -> str:
+    """优先 UTF-8（含 BOM），回退 GBK（中文版 Excel 另存 CSV 的默认编码）"""
+    for enc in ("utf-8-sig", "gbk"):
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("无法识别 CSV 编码（支持 UTF-8 / GBK）")
+
+
+def _iter_csv(data: bytes) -> Iterator[List[Any]]:
+    yield from csv.reader(io.StringIO(_decode_csv(data), newline=""))
+
+
+def _iter_xlsx(data: bytes) -> Iterator[List[Any]]:
+    if openpyxl is None:
+        raise ValueError("读取 .xlsx 需要安装 openpyxl（或另存为 CSV）")
+    wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def read_table(data: bytes, filename: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """按表头逐行产出 (行号, {列名: 值})，跳过空行"""
+    is_xlsx = filename.lower().endswith((".xlsx", ".xlsm")) or data[:2] == b"PK"
+    rows = _iter_xlsx(data) if is_xlsx else _iter_csv(data)
+
+    header: Optional[List[str]] = None
+    for line_no, cells in enumerate(rows, start=1):
+        if header is None:
+            header = [str(c).strip() if c is not None else "" for c in cells]
+            unknown = set(header) - set(INPUT_COLUMNS) - {LABEL_COLUMN, ""}
+            if not set(header) & set(INPUT_COLUMNS):
+                raise ValueError(
+                    f"表头缺少输入列，应包含: {', '.join(INPUT_COLUMNS)}"
+                )
+            if unknown:
+                raise ValueError(f"无法识别的列: {', '.join(sorted(unknown))}")
+            continue
+        if all(c is None or str(c).strip() == "" for c in cells):
+            continue
+        yield line_no, dict(zip(header, cells))
+
+
+def parse_import(
+    data: bytes, filename: str
+) -> Tuple[List[Tuple[JobRequest, Optional[str]]], List[ImportRowError]]:
+    """解析上传的表格，返回 ([(请求, 炉号)], [逐行错误])"""
+    accepted: List[Tuple[JobRequest, Optional[str]]] = []
+    errors: List[ImportRowError] = []
+    for line_no, row in read_table(data, filename):
+        if len(accepted) + len(errors) >= MAX_ROWS:
+            raise ValueError(f"单次导入最多 {MAX_ROWS} 行")
+        label = row.get(LABEL_COLUMN)
+        label = str(label).strip() if label not in (None, "") else None
+        try:
+            accepted.append((request_from_row(row), label))
+        except ValidationError as exc:
+            errors.append(ImportRowError(
+                row=line_no,
+                errors=[
+                    f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}"
+                    for e in exc.errors()
+                ],
+            ))
+    return accepted, errors
+
+
+# ── 流式导出 ──────────────────────────────────────────────
+
+
+def _csv_line(values: List[Any]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\r\n").writerow(
+        ["" if v is None else v for v in values]
+    )
+    return buf.getvalue()
+
+
+def _export_row(index: int, job: JobRecord) -> str:
+    row: Dict[str, Any] = {
+        "row": index,
+        LABEL_COLUMN: job.label,
+        "job_id": job.job_id,
+        "status": job.status.value,
+        "error": job.error,
+        **flatten_request(job.request),
+        **flatten_result(job.result),
+    }
+    return _csv_line([row[c] for c in EXPORT_COLUMNS])
+
+
+async def iter_group_csv(job_ids: List[str]) -> AsyncIterator[bytes]:
+    """按完成先后逐行输出 CSV；未完成的任务等其结束后再输出
+
+    每次只格式化一行，内存占用与组大小无关（只持有等待中的 job_id）。
+    首行带 UTF-8 BOM，便于 Excel 直接打开中文内容。
+    """
+    yield ("\ufeff" + _csv_line(EXPORT_COLUMNS)).encode("utf-8")
+
+    index = {jid: i for i, jid in enumerate(job_ids, start=1)}
+    waiting = {
+        asyncio.ensure_future(job_manager.wait(jid)): jid for jid in job_ids
+    }
+    try:
+        while waiting:
+            done, _ = await asyncio.wait(
+                waiting, return_when=asyncio.FIRST_COMPLETED
+            )
+            for fut in done:
+                jid = waiting.pop(fut)
+                yield _export_row(index[jid], fut.result()).encode("utf-8")
+    finally:
+        for fut in waiting:
+            fut.cancel()
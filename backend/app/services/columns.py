@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""扁平列定义：JobRequest / CalculationResult ↔ 一行一条的表格记录
+
+批量导入导出、结果归档与对比分析共用同一套列名。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, Optional
+
+from ..models import (
+    CalculationResult,
+    ConditionsInput,
+    JobRequest,
+    SlagInput,
+    SlagResult,
+    SteelInput,
+    SteelResult,
+)
+
+# ── 输入列 ────────────────────────────────────────────────
+
+INPUT_COLUMNS: List[str] = [
+    "calc_type",
+    *SteelInput.model_fields,
+    *SlagInput.model_fields,
+    *ConditionsInput.model_fields,
+    "target_element",
+    "target_value",
+    "alpha_guess",
+]
+
+# 可参与数值分析的输入列（排除枚举与字符串字段）
+NUMERIC_INPUT_COLUMNS: List[str] = [
+    c for c in INPUT_COLUMNS
+    if c not in ("calc_type", "Mn_field", "target_element")
+]
+
+# ── 结果列 ────────────────────────────────────────────────
+
+RESULT_COLUMNS: List[str] = [
+    "alpha_Ca_g",
+    "T_K",
+    "eq_P_atm",
+    *(f"steel_{f}" for f in SteelResult.model_fields),
+    *(f"slag_{f}" for f in SlagResult.model_fields),
+]
+
+
+def flatten_request(request: JobRequest) -> Dict[str, Any]:
+    return {
+        "calc_type": request.calc_type.value,
+        **request.steel.model_dump(),
+        **request.slag.model_dump(),
+        **request.conditions.model_dump(),
+        "target_element": request.target.element,
+        "target_value": request.target.value,
+        "alpha_guess": request.alpha_guess,
+    }
+
+
+def flatten_result(result: Optional[CalculationResult]) -> Dict[str, Any]:
+    """结果为空（未完成 / 失败）时各列为 None"""
+    if result is None:
+        return dict.fromkeys(RESULT_COLUMNS)
+    row: Dict[str, Any] = {
+        "alpha_Ca_g": result.alpha_Ca_g,
+        "T_K": result.T_K,
+        "eq_P_atm": result.P_atm,
+    }
+    row.update({f"steel_{k}": v for k, v in result.steel.model_dump().items()})
+    row.update({f"slag_{k}": v for k, v in result.slag.model_dump().items()})
+    return row
+
+
+def _cell(value: Any) -> Any:
+    """去除字符串首尾空白；空单元格视为缺省（None）"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def request_from_row(row: Mapping[str, Any]) -> JobRequest:
+    """由扁平行构造 JobRequest；校验失败抛出 pydantic.ValidationError
+
+    calc_type 缺省时按 target_element 推断（与预设加载规则一致）。
+    """
+    r = {k: _cell(row.get(k)) for k in INPUT_COLUMNS}
+    mn = r["Mn_field"]
+    # 整数值的浮点数（Excel 常见）还原为整数文本
+    if isinstance(mn, float) and mn.is_integer():
+        mn = int(mn)
+    elem = r["target_element"]
+    calc_type = r["calc_type"] or (
+        "deoxidation" if elem == "Al" else "desulfurization"
+    )
+
+    def pick(*names: str) -> Dict[str, Any]:
+        return {n: r[n] for n in names if r[n] is not None}
+
+    data: Dict[str, Any] = {
+        "calc_type": calc_type,
+        "steel": {
+            **pick("Fe_g", "Si_g", "Al_g", "O_g", "S_g"),
+            "Mn_field": "" if mn is None else str(mn),
+        },
+        "slag": pick(*SlagInput.model_fields),
+        "conditions": pick(*ConditionsInput.model_fields),
+        "target": {"element": elem, "value": r["target_value"]},
+    }
+    if r["alpha_guess"] is not None:
+        data["alpha_guess"] = r["alpha_guess"]
+    return JobRequest.model_validate(data)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""多任务对比：对齐的输入 / 结果矩阵、相对参照炉次的差值与 Ca 差异归因
+
+归因方法：在参与对比、且与参照同计算类型的任务上，以发生变化的数值输入
+列构造设计矩阵，最小二乘拟合 alpha_Ca_g ~ 截距 + 输入，得到各输入的局部
+灵敏度 ∂alpha/∂x；每个任务的 Ca 差值按 灵敏度 × 输入差 分摊到各输入，
+绝对值最大者即主要驱动因素。
+
+只有样本数比变化的输入数（加截距）多出 _MIN_DOF 个以上、且输入之间不共线
+时灵敏度才可辨识；否则不做归因，只给出各任务相对参照的输入差值。
+numpy 为可选依赖，未安装时同样只给出输入差值。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from .columns import (
+    INPUT_COLUMNS,
+    NUMERIC_INPUT_COLUMNS,
+    RESULT_COLUMNS,
+    flatten_request,
+    flatten_result,
+)
+from .job_store import JobRecord
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+CATEGORICAL_COLUMNS = [c for c in INPUT_COLUMNS if c not in NUMERIC_INPUT_COLUMNS]
+TARGET = "alpha_Ca_g"
+
+# 相对阈值：|Δ| 不超过 _EPS × max(|x|, |x_ref|) 的输入视为未变化
+_EPS = 1e-9
+# 回归至少保留的残差自由度
+_MIN_DOF = 3
+
+
+def _changed(a: float, b: float) -> bool:
+    return abs(a - b) > _EPS * max(abs(a), abs(b))
+
+
+def _fit_sensitivity(x: List[List[float]], y: List[float]) -> Optional[List[float]]:
+    """标准化后最小二乘拟合 y ~ 截距 + x，返回原始尺度下的 ∂y/∂x；输入共线时返回 None"""
+    a = np.asarray(x, dtype=float)
+    centered = a - a.mean(axis=0)
+    scale = np.sqrt((centered ** 2).mean(axis=0))
+    scale[scale == 0] = 1.0
+    z = centered / scale
+    if np.linalg.matrix_rank(z) < z.shape[1]:
+        return None
+    yc = np.asarray(y, dtype=float)
+    beta, *_ = np.linalg.lstsq(z, yc - yc.mean(), rcond=None)
+    return (beta / scale).tolist()
+
+
+def compare_jobs(jobs: List[JobRecord], reference_id: Optional[str] = None) -> Dict[str, Any]:
+    """jobs 须为已完成任务（含 request / result），顺序即输出顺序"""
+    if not jobs:
+        raise ValueError("没有可对比的已完成任务")
+    ids = [j.job_id for j in jobs]
+    ref_id = reference_id or ids[0]
+    if ref_id not in ids:
+        raise ValueError(f"参照任务 {ref_id} 不在对比集合中（或未完成）")
+    ref = ids.index(ref_id)
+
+    # 一次遍历拼出列式数据
+    rows_in = [flatten_request(j.request) for j in jobs]
+    rows_out = [flatten_result(j.result) for j in jobs]
+    cols_in = {c: [r[c] for r in rows_in] for c in INPUT_COLUMNS}
+    cols_out = {c: [r[c] for r in rows_out] for c in RESULT_COLUMNS}
+
+    d_in = {
+        c: [v - cols_in[c][ref] for v in cols_in[c]] for c in NUMERIC_INPUT_COLUMNS
+    }
+    d_out = {c: [v - cols_out[c][ref] for v in cols_out[c]] for c in RESULT_COLUMNS}
+
+    # 回归样本：与参照同计算类型的任务
+    ref_type = cols_in["calc_type"][ref]
+    same = [i for i, t in enumerate(cols_in["calc_type"]) if t == ref_type]
+    varying = [
+        c for c in NUMERIC_INPUT_COLUMNS
+        if any(_changed(cols_in[c][i], cols_in[c][ref]) for i in same)
+    ]
+    sensitivity: Dict[str, float] = {}
+    if not varying:
+        reason = "同类型任务的数值输入均未变化"
+    elif np is None:
+        reason = "未安装 numpy"
+    elif len(same) < len(varying) + 1 + _MIN_DOF:
+        reason = (
+            f"样本 {len(same)} 个不足以辨识 {len(varying)} 个变化输入的灵敏度"
+            f"（至少需要 {len(varying) + 1 + _MIN_DOF} 个）"
+        )
+    else:
+        fitted = _fit_sensitivity(
+            [[cols_in[c][i] for c in varying] for i in same],
+            [cols_out[TARGET][i] for i in same],
+        )
+        if fitted is None:
+            reason = "变化的输入之间共线，灵敏度不可辨识"
+        else:
+            sensitivity = dict(zip(varying, fitted))
+            reason = None
+    method = "regression" if sensitivity else "none"
+
+    contributions: List[Dict[str, float]] = []
+    if sensitivity:
+        # 全部任务的贡献一次算出：输入差矩阵 × 灵敏度
+        deltas = np.asarray([[d_in[c][i] for c in varying] for i in range(len(ids))])
+        matrix = deltas * np.asarray([sensitivity[c] for c in varying])
+        contributions = [dict(zip(varying, row)) for row in matrix.tolist()]
+
+    drivers = []
+    for i, jid in enumerate(ids):
+        changed_cat = [
+            c for c in CATEGORICAL_COLUMNS if cols_in[c][i] != cols_in[c][ref]
+        ]
+        entry: Dict[str, Any] = {
+            "job_id": jid,
+            "alpha_delta": d_out[TARGET][i],
+            "categorical_changes": changed_cat,
+            "input_changes": {
+                c: d_in[c][i] for c in NUMERIC_INPUT_COLUMNS
+                if _changed(cols_in[c][i], cols_in[c][ref])
+            },
+        }
+        if i == ref:
+            entry.update(contributions={}, top_driver=None)
+        elif "calc_type" in changed_cat:
+            entry.update(contributions={}, top_driver="calc_type")
+        elif sensitivity:
+            contrib = contributions[i]
+            entry["contributions"] = contrib
+            entry["unexplained"] = d_out[TARGET][i] - sum(contrib.values())
+            entry["top_driver"] = max(contrib, key=lambda c: abs(contrib[c]))
+        else:
+            entry.update(contributions={}, top_driver=None)
+        drivers.append(entry)
+
+    return {
+        "reference": ref_id,
+        "job_ids": ids,
+        "input_columns": INPUT_COLUMNS,
+        "result_columns": RESULT_COLUMNS,
+        "inputs": [[cols_in[c][i] for c in INPUT_COLUMNS] for i in range(len(ids))],
+        "results": [[cols_out[c][i] for c in RESULT_COLUMNS] for i in range(len(ids))],
+        "input_deltas": {c: d_in[c] for c in NUMERIC_INPUT_COLUMNS},
+        "result_deltas": d_out,
+        "attribution": {
+            "method": method,
+            "samples": len(same),
+            "varying_inputs": varying,
+            "sensitivity": sensitivity,
+            "reason": reason,
+        },
+        "drivers": drivers,
+    }
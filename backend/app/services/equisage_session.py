@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""常驻 EquiSage 会话：每个执行槽位保持一个 EquiSage 进程，经 spool 目录交接任务
+
+factsage.runner = session 时启用。会话进程运行一个循环宏：等待
+in/job-<N>.equi 出现 → OPEN → CALC → SAVE out/job-<N>.xml / .res →
+N+1 继续等待。这样数据库（FT53/MI53/OX53）只在进程启动时加载一次，
+单任务开销接近纯计算时间。
+
+Python 侧职责：
+  - 按序号把渲染好的 .equi 原子放入 spool（先写 .tmp 再改名）；
+  - 轮询输出文件，完成后移回任务目录 out/case.xml，后续解析与
+    oneshot 模式完全一致；
+  - 健康检查：每次派发前确认进程存活，任务超时 / 进程退出时结束该
+    会话，下次使用时自动重启；执行 session_recycle_jobs 个任务后主动
+    重启以回收进程内存；后台回收任务（start() 启动）让空闲超过
+    session_idle_seconds 的会话退出，释放许可证席位。
+
+温度 / 压力取自 .equi 文件本身（模板渲染时已写入），会话宏不再 SET。
+循环宏可通过 templates/session_loop.mac.j2 覆盖，变量 spool_dir
+为本会话 spool 目录（以 \\ 结尾）。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import shutil
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from jinja2 import Template
+
+from ..config import ConfigSnapshot, settings
+from .factsage_runner import hidden_startupinfo
+from .template_renderer import _read_text, _write_text
+
+logger = logging.getLogger(__name__)
+
+SESSION_MACRO_TEMPLATE = "session_loop.mac.j2"
+
+# 内置循环宏：按序号等待输入文件，计算后保存到 out/，收到 in\stop 时退出
+_DEFAULT_MACRO = r"""VARIABLE %Spool %N %InFile %OutFile
+HIDE
+HIDE_MACRO
+%Spool = "{{ spool_dir }}"
+%N = 1
+
+:WAITJOB
+IF EXIST "%Spool\in\stop" GOTO DONE
+%InFile  = "%Spool\in\job-%N.equi"
+IF NOT EXIST %InFile GOTO IDLE
+
+OPEN %InFile
+CALC
+%OutFile = "%Spool\out\job-%N"
+SAVE %OutFile.xml
+SAVE %OutFile.res
+%N = %N + 1
+GOTO WAITJOB
+
+:IDLE
+WAIT 0.1
+GOTO WAITJOB
+
+:DONE
+END
+"""
+
+_POLL_SECONDS = 0.1
+_STOP_GRACE_SECONDS = 5
+# 空闲回收的检查间隔上限
+_REAP_INTERVAL_SECONDS = 30.0
+
+
+def _render_macro(spool: Path) -> str:
+    custom = settings.templates_dir / SESSION_MACRO_TEMPLATE
+    text = _read_text(custom) if custom.exists() else _DEFAULT_MACRO
+    return Template(text).render(spool_dir=str(spool) + "\\")
+
+
+class EquiSageSession:
+    """一个常驻 EquiSage 进程及其 spool 目录（同一时刻只执行一个任务）"""
+
+    def __init__(self, index: int, root: Path) -> None:
+        self.index = index
+        self._root = root
+        self.spool: Optional[Path] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._seq = 0
+        self.jobs = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._proc.pid if self.alive else None
+
+    def start(self) -> None:
+        """（重新）启动进程；每次使用全新的 spool 目录，避免旧输出被误认"""
+        self.kill()
+        if self.spool is not None:
+            shutil.rmtree(self.spool, ignore_errors=True)
+        cfg = settings.snapshot
+        self.spool = self._root / f"slot-{self.index}-{uuid.uuid4().hex[:6]}"
+        (self.spool / "in").mkdir(parents=True)
+        (self.spool / "out").mkdir()
+        mac = self.spool / "session.mac"
+        _write_text(mac, _render_macro(self.spool))
+        try:
+            self._proc = subprocess.Popen(
+                [str(cfg.factsage_exe), "/EQUILIB", "/MACRO", str(mac)],
+                cwd=str(cfg.factsage_dir),
+                startupinfo=hidden_startupinfo(),
+            )
+        except FileNotFoundError:
+            raise FileNotFoundError(f"找不到 EquiSage.exe: {cfg.factsage_exe}") from None
+        self._seq = 0
+        self.jobs = 0
+        logger.info("EquiSage 会话 %d 已启动 (pid=%d)", self.index, self._proc.pid)
+
+    def kill(self) -> None:
+        """立即结束进程（不等待）"""
+        if self.alive:
+            self._proc.kill()
+            logger.warning("EquiSage 会话 %d 已终止 (pid=%d)", self.index, self._proc.pid)
+        self._proc = None
+
+    def stop(self) -> None:
+        """通知宏退出，宽限期内未退出则强制结束，并清理 spool"""
+        if self.alive:
+            (self.spool / "in" / "stop").touch()
+            try:
+                self._proc.wait(timeout=_STOP_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                pass
+        self.kill()
+        if self.spool is not None:
+            shutil.rmtree(self.spool, ignore_errors=True)
+            self.spool = None
+
+    async def run(self, paths: Dict[str, Any]) -> Path:
+        """把任务交给会话执行，返回移回任务目录后的 XML 路径"""
+        cfg = settings.snapshot
+        if not self.alive or self.jobs >= cfg.session_recycle_jobs:
+            await asyncio.to_thread(self.start)
+
+        self._seq += 1
+        name = f"job-{self._seq}"
+        inbox = self.spool / "in" / f"{name}.equi"
+        xml = self.spool / "out" / f"{name}.xml"
+        res = self.spool / "out" / f"{name}.res"
+
+        def _hand_over() -> None:
+            tmp = inbox.with_suffix(".tmp")
+            shutil.copyfile(paths["equi_path"], tmp)
+            tmp.replace(inbox)
+
+        await asyncio.to_thread(_hand_over)
+
+        # .res 在 .xml 之后保存；两者都在且 xml 大小两次轮询不变即视为写完
+        deadline = time.monotonic() + cfg.factsage_timeout
+        last_size = -1
+        while True:
+            if not self.alive:
+                rc = self._proc.returncode if self._proc else None
+                raise RuntimeError(f"EquiSage 会话 {self.index} 意外退出 (退出码 {rc})")
+            if xml.exists() and res.exists():
+                size = xml.stat().st_size
+                if size > 0 and size == last_size:
+                    break
+                last_size = size
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"EquiSage 会话 {self.index} 超时 ({cfg.factsage_timeout}s)")
+            await asyncio.sleep(_POLL_SECONDS)
+
+        prefix = paths["prefix"]
+        out_dir: Path = paths["out_dir"]
+
+        def _collect() -> Path:
+            dst = out_dir / f"{prefix}.xml"
+            shutil.move(str(xml), dst)
+            shutil.move(str(res), out_dir / f"{prefix}.res")
+            inbox.unlink(missing_ok=True)
+            return dst
+
+        dst = await asyncio.to_thread(_collect)
+        self.jobs += 1
+        return dst
+
+
+class SessionPool:
+    """按需创建会话：并发数由调用方（本机槽位 / agent 槽位）决定"""
+
+    def __init__(self) -> None:
+        self._idle: List[EquiSageSession] = []
+        self._sessions: List[EquiSageSession] = []
+        self._next_index = 0
+        self._reaper: Optional[asyncio.Task] = None
+        settings.on_reload(self._on_config_reload)
+
+    def start(self) -> None:
+        """启动空闲会话的后台回收（需在事件循环中调用）"""
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def stop(self) -> None:
+        """停止后台回收并结束全部会话"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        await asyncio.to_thread(self.close)
+
+    def _root(self) -> Path:
+        # 启用临时区时 spool 也放在内存盘上
+        return (settings.scratch_dir or settings.work_root) / "_sessions"
+
+    async def run(self, paths: Dict[str, Any]) -> Path:
+        if self._idle:
+            session = self._idle.pop()
+        else:
+            session = EquiSageSession(self._next_index, self._root())
+            self._next_index += 1
+            self._sessions.append(session)
+        try:
+            return await session.run(paths)
+        except BaseException:
+            # 状态不明的进程不再接任务（超时任务的迟到输出也不会被误认），下次重启
+            session.kill()
+            raise
+        finally:
+            session.last_used = time.monotonic()
+            if settings.factsage_runner == "session":
+                self._idle.append(session)
+            else:
+                self._retire(session)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [
+            {"slot": s.index, "pid": s.pid, "alive": s.alive, "jobs": s.jobs}
+            for s in self._sessions
+        ]
+
+    def close(self) -> None:
+        """结束全部会话（阻塞，最多每个会话一个宽限期）"""
+        for session in self._sessions:
+            session.stop()
+        self._idle = []
+        self._sessions = []
+
+    def _retire(self, session: EquiSageSession) -> None:
+        session.kill()
+        if session.spool is not None:
+            shutil.rmtree(session.spool, ignore_errors=True)
+        if session in self._sessions:
+            self._sessions.remove(session)
+
+    async def _reap_loop(self) -> None:
+        while True:
+            interval = min(_REAP_INTERVAL_SECONDS, settings.session_idle_seconds / 4)
+            await asyncio.sleep(max(1.0, interval))
+            try:
+                await self._reap_idle()
+            except Exception:
+                logger.error("回收空闲 EquiSage 会话失败", exc_info=True)
+
+    async def _reap_idle(self) -> None:
+        limit = settings.session_idle_seconds
+        now = time.monotonic()
+        stale = [s for s in self._idle if now - s.last_used > limit]
+        for session in stale:
+            self._idle.remove(session)
+            self._sessions.remove(session)
+            logger.info("EquiSage 会话 %d 空闲超时，退出", session.index)
+            await asyncio.to_thread(session.stop)
+
+    def _on_config_reload(self, old: ConfigSnapshot, new: ConfigSnapshot) -> None:
+        if old.factsage_runner == "session" and new.factsage_runner != "session":
+            for session in self._idle:
+                self._retire(session)
+            self._idle = []
+
+
+# 全局单例
+session_pool = SessionPool()
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-"""FactSage 执行服务：真实调用 EquiSage.exe / mock 模拟"""
+"""FactSage 执行服务：真实调用 EquiSage.exe（单次 / 常驻会话）/ mock 模拟"""
 from __future__ import annotations
 
 import asyncio
@@ -24,37 +24,46 @@ async def run_calculation(
 # ── 真实执行 ──────────────────────────────────────────────
 
 
-def _run_factsage_blocking(mac_path: Path) -> int:
-    """同步调用 EquiSage.exe（在线程池中执行）"""
-    exe = settings.factsage_exe
-    if not exe.exists():
-        raise FileNotFoundError(f"找不到 EquiSage.exe: {exe}")
+def hidden_startupinfo():
+    """Windows 下隐藏 EquiSage 窗口；其他平台返回 None"""
+    if sys.platform != "win32":
+        return None
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = 0  # SW_HIDE
+    return startupinfo
 
-    cmd = [str(exe), "/EQUILIB", "/MACRO", str(mac_path)]
 
-    startupinfo = None
-    if sys.platform == "win32":
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = 0  # SW_HIDE
+def _run_factsage_blocking(mac_path: Path) -> int:
+    """同步调用 EquiSage.exe（在线程池中执行）"""
+    cfg = settings.snapshot
+    cmd = [str(cfg.factsage_exe), "/EQUILIB", "/MACRO", str(mac_path)]
 
-    p = subprocess.Popen(
-        cmd, cwd=str(settings.factsage_dir), startupinfo=startupinfo
-    )
-    return p.wait(timeout=settings.factsage_timeout)
+    try:
+        p = subprocess.Popen(
+            cmd, cwd=str(cfg.factsage_dir), startupinfo=hidden_startupinfo()
+        )
+    except FileNotFoundError:
+        raise FileNotFoundError(f"找不到 EquiSage.exe: {cfg.factsage_exe}") from None
+    return p.wait(timeout=cfg.factsage_timeout)
 
 
 async def _real_calculation(
     request: JobRequest, paths: Dict[str, Any]
 ) -> CalculationResult:
-    loop = asyncio.get_event_loop()
-    rc = await loop.run_in_executor(None, _run_factsage_blocking, paths["mac_path"])
-    if rc != 0:
-        raise RuntimeError(f"FactSage 退出码: {rc}")
-
-    xml_path: Path = paths["out_dir"] / f"{paths['prefix']}.xml"
-    if not xml_path.exists():
-        raise FileNotFoundError(f"FactSage 输出未找到: {xml_path}")
+    if settings.factsage_runner == "session":
+        from .equisage_session import session_pool
+
+        xml_path = await session_pool.run(paths)
+    else:
+        loop = asyncio.get_event_loop()
+        rc = await loop.run_in_executor(None, _run_factsage_blocking, paths["mac_path"])
+        if rc != 0:
+            raise RuntimeError(f"FactSage 退出码: {rc}")
+
+        xml_path: Path = paths["out_dir"] / f"{paths['prefix']}.xml"
+        if not xml_path.exists():
+            raise FileNotFoundError(f"FactSage 输出未找到: {xml_path}")
 
     from .result_parser import parse_result_xml
 
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""HTTP 缓存：ETag / 条件请求 / 带指纹的静态资源"""
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def make_etag(body: bytes) -> str:
+    """由未压缩内容生成弱 ETag
+
+    响应经压缩中间件按 Accept-Encoding 输出 identity / gzip / br，字节各不相同，
+    强 ETag 要求逐字节一致，因此这里只声明语义等价（W/）。
+    """
+    return 'W/"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 比较（弱比较，两侧均忽略 W/ 前缀，支持 *）"""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    opaque = etag.removeprefix("W/")
+    return "*" in tags or any(t.removeprefix("W/") == opaque for t in tags)
+
+
+def cached_response(
+    body: bytes,
+    etag: str,
+    cache_control: str,
+    request_headers: Mapping[str, str],
+    media_type: str = "application/json",
+) -> Response:
+    """带 ETag 的响应；客户端持有相同版本时返回 304"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+# ── 静态资源 ──────────────────────────────────────────────
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """URL 携带与当前内容一致的 ?v=指纹 时按不可变资源长期缓存，否则每次协商"""
+
+    def __init__(self, *, directory: Path, **kwargs) -> None:
+        super().__init__(directory=directory, **kwargs)
+        self.fingerprints: Dict[str, str] = {
+            p.relative_to(directory).as_posix(): _file_hash(p)
+            for p in Path(directory).rglob("*")
+            if p.is_file()
+        }
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        rel = Path(full_path).resolve().relative_to(Path(self.directory).resolve()).as_posix()
+        version = _query_param(scope, "v")
+        fresh = version is not None and version == self.fingerprints.get(rel)
+        response.headers["Cache-Control"] = IMMUTABLE if fresh else REVALIDATE
+        # 与 make_etag 相同：文件可能被压缩输出，ETag 改为弱校验
+        etag = response.headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            response.headers["etag"] = "W/" + etag
+        return response
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+
+
+def _query_param(scope: Scope, name: str) -> Optional[str]:
+    for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+        key, _, value = pair.partition("=")
+        if key == name:
+            return value
+    return None
+
+
+_ASSET_REF = re.compile(r'(?P<attr>href|src)="/(?P<mount>css|js)/(?P<path>[^"?#]+)"')
+
+
+def fingerprint_html(html: str, mounts: Mapping[str, FingerprintedStaticFiles]) -> str:
+    """将 index.html 中的 /css、/js 引用改写为带 ?v=指纹 的 URL"""
+
+    def repl(m: re.Match) -> str:
+        static = mounts.get(m["mount"])
+        fp = static.fingerprints.get(m["path"]) if static else None
+        if not fp:
+            return m.group(0)
+        return f'{m["attr"]}="/{m["mount"]}/{m["path"]}?v={fp}"'
+
+    return _ASSET_REF.sub(repl, html)
+
+
+class CachedPage:
+    """内存中的页面（已改写资源指纹），带 ETag 协商缓存"""
+
+    def __init__(self, html: str) -> None:
+        self.body = html.encode("utf-8")
+        self.etag = make_etag(self.body)
+
+    def response(self, request_headers: Headers) -> Response:
+        return cached_response(
+            self.body, self.etag, REVALIDATE, request_headers,
+            media_type="text/html; charset=utf-8",
+        )
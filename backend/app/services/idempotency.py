@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Idempotency-Key → job_id 映射：SQLite 持久化，按 TTL 过期
+
+同一个键在有效期内重复提交（网络重试、重复点击）时返回原任务，
+不再排队执行新的 FactSage 计算。键在提交任务之前以预分配的 job_id
+原子预留（BEGIN IMMEDIATE + INSERT OR IGNORE），多个 API 进程共用
+同一个 idempotency.db 时也只有一个请求能真正提交。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ..config import settings
+from ..models import JobRequest
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request: JobRequest) -> str:
+    """请求内容指纹（字段顺序无关）"""
+    canonical = json.dumps(request.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = self._path or settings.work_root / "idempotency.db"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                " key TEXT PRIMARY KEY,"
+                " job_id TEXT NOT NULL,"
+                " fingerprint TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_idem_expires ON idempotency(expires_at)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def reserve(self, key: str, job_id: str, fingerprint: str) -> Tuple[str, str]:
+        """原子预留键：未被占用时登记为 job_id；返回键当前对应的 (job_id, fingerprint)
+
+        返回的 job_id 等于传入值表示本次请求取得了该键，应以此 id 提交任务。
+        """
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+                db.execute(
+                    "INSERT OR IGNORE INTO idempotency VALUES (?, ?, ?, ?)",
+                    (key, job_id, fingerprint, now + settings.idempotency_ttl),
+                )
+                row = db.execute(
+                    "SELECT job_id, fingerprint FROM idempotency WHERE key = ?", (key,)
+                ).fetchone()
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return row[0], row[1]
+
+    def takeover(self, key: str, stale_job_id: str, job_id: str) -> bool:
+        """预留者未能提交任务（进程崩溃）时改由 job_id 接管
+
+        仅当键仍指向 stale_job_id 时成功。
+        """
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE idempotency SET job_id = ?, expires_at = ?"
+                " WHERE key = ? AND job_id = ?",
+                (job_id, time.time() + settings.idempotency_ttl, key, stale_job_id),
+            )
+            db.commit()
+        return cur.rowcount == 1
+
+    def release(self, key: str, job_id: str) -> None:
+        """提交失败时释放本次预留，允许客户端重试"""
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "DELETE FROM idempotency WHERE key = ? AND job_id = ?", (key, job_id)
+            )
+            db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局单例
+idempotency_store = IdempotencyStore()
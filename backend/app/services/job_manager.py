@@ -1,103 +1,578 @@
 # -*- coding: utf-8 -*-
-"""任务管理：内存队列 + 后台 worker + 状态追踪"""
+"""任务管理：内存队列 + 本机 worker + 远程 agent 租约分发 + 状态追踪
+
+任务记录由 job_store 持久化（见 job_store.py），内存中只保留最近的
+jobs.max_records 条，更早的任务在查询时从数据库重建。
+"""
 from __future__ import annotations
 
 import asyncio
+import itertools
 import logging
+import time
 import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from ..config import ConfigSnapshot, settings
 from ..models import (
     CalcType,
     CalculationResult,
     JobRequest,
     JobStatus,
 )
+from .autotune import SlotAutotuner
 from .factsage_runner import run_calculation
+from .job_store import JobRecord, JobStore, job_store
+from .result_archive import result_archive
+from .scratch import discard_run_dir, finalize_job_dir
 from .template_renderer import render_job_templates
 
 logger = logging.getLogger(__name__)
 
+LOCAL_WORKER = "local"
+
+# 自动调优检查间隔（窗口是否结束由调优器判断）
+_AUTOTUNE_TICK_SECONDS = 1.0
+
+
+async def execute_request(job_id: str, request: JobRequest) -> CalculationResult:
+    """渲染模板并执行一次计算（服务端本机槽位与远程 agent 共用）"""
+    try:
+        paths = render_job_templates(job_id, request)
+    except BaseException:
+        discard_run_dir(job_id)
+        raise
+    try:
+        result = await run_calculation(job_id, request, paths)
+    except asyncio.CancelledError:
+        # 租约丢失 / 停止 / 槽位缩减时被取消：不再等待打包，直接清理临时区
+        discard_run_dir(job_id)
+        raise
+    except Exception:
+        await asyncio.to_thread(finalize_job_dir, job_id, paths, None)
+        raise
+    await asyncio.to_thread(finalize_job_dir, job_id, paths, result)
+    return result
+
 
 class JobManager:
-    """单例任务管理器：FIFO 队列，每次只跑一个 FactSage 进程"""
+    """单例任务调度器：FIFO 队列，由本机槽位与远程 agent 共同消费
 
-    def __init__(self) -> None:
-        self._jobs: Dict[str, dict] = {}
+    本机槽位数由 dispatch.local_slots 决定（默认 1，即每次只跑一个
+    FactSage 进程），autotune.enabled 时以其为起点按实测吞吐自动调整
+    （见 autotune.py）；远程 agent 通过 lease() 租用任务，需在租约到期前
+    heartbeat() 续约，超时未续约的任务重新入队。
+    """
+
+    def __init__(self, store: Optional[JobStore] = None) -> None:
+        self._store = store or job_store
+        self._jobs: Dict[str, JobRecord] = {}
         self._queue: asyncio.Queue[str] = asyncio.Queue()
-        self._worker_task: Optional[asyncio.Task] = None
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._busy: Set[int] = set()
+        self._target_slots = 0
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._autotune_task: Optional[asyncio.Task] = None
+        self._tuner = SlotAutotuner()
+        self._agents: Dict[str, dict] = {}
+        settings.on_reload(self._on_config_reload)
 
     # ── 生命周期 ────────────────────────────────────────────
 
     async def start(self) -> None:
-        self._worker_task = asyncio.create_task(self._worker())
-        logger.info("JobManager worker 已启动")
+        interrupted = self._store.recover()
+        if interrupted:
+            logger.warning("%d 个任务在上次停止时未完成，已标记为失败", interrupted)
+        self._resize(self._initial_slots(settings.snapshot))
+        self._reaper_task = asyncio.create_task(self._reaper())
+        self._autotune_task = asyncio.create_task(self._autotune())
+        logger.info("JobManager 已启动, 本机槽位=%d", self._target_slots)
 
     async def stop(self) -> None:
-        if self._worker_task:
-            self._worker_task.cancel()
-            try:
-                await self._worker_task
-            except asyncio.CancelledError:
-                pass
-        logger.info("JobManager worker 已停止")
+        self._target_slots = 0
+        tasks = [*self._workers.values(), self._reaper_task, self._autotune_task]
+        for task in tasks:
+            if task:
+                task.cancel()
+        for task in tasks:
+            if task:
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._workers = {}
+        self._reaper_task = None
+        self._autotune_task = None
+        logger.info("JobManager 已停止")
+
+    def _on_config_reload(self, old: ConfigSnapshot, new: ConfigSnapshot) -> None:
+        keys = ("local_slots", "autotune_enabled", "autotune_min_slots",
+                "autotune_max_slots", "autotune_tolerance")
+        if self._reaper_task is not None and any(
+            getattr(old, k) != getattr(new, k) for k in keys
+        ):
+            self._tuner.reset()
+            self._resize(self._initial_slots(new))
+
+    def _initial_slots(self, cfg: ConfigSnapshot) -> int:
+        """local_slots = 0（纯调度节点）时不启用自动调优"""
+        if cfg.autotune_enabled and cfg.local_slots > 0:
+            return self._tuner.clamp(cfg.local_slots)
+        return cfg.local_slots
+
+    def _resize(self, target: int) -> None:
+        """调整本机槽位数：空闲的多余槽位立即退出，忙碌的在当前任务结束后退出"""
+        self._target_slots = target
+        for slot in range(target):
+            if slot not in self._workers:
+                self._workers[slot] = asyncio.create_task(self._worker(slot))
+        for slot, task in list(self._workers.items()):
+            if slot >= target and slot not in self._busy:
+                task.cancel()
+                del self._workers[slot]
+        logger.info("本机槽位数 -> %d", target)
 
     # ── 公开接口 ────────────────────────────────────────────
 
-    async def submit(self, request: JobRequest) -> str:
-        """提交任务，返回 job_id"""
-        job_id = uuid.uuid4().hex[:8]
-        self._jobs[job_id] = {
-            "job_id": job_id,
-            "status": JobStatus.pending,
-            "calc_type": request.calc_type,
-            "request": request,
-            "created_at": datetime.now().isoformat(timespec="seconds"),
-            "result": None,
-            "error": None,
-        }
+    async def submit(
+        self,
+        request: JobRequest,
+        group_id: Optional[str] = None,
+        label: Optional[str] = None,
+        job_id: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> str:
+        """提交任务，返回 job_id（job_id 可由调用方预先分配，如幂等键预留）"""
+        job_id = job_id or uuid.uuid4().hex
+        job = self._store.create(
+            job_id,
+            request,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            submitted_ts=time.time(),
+            group_id=group_id,
+            label=label,
+            source=source,
+        )
+        job.done = asyncio.Event()
+        self._remember(job)
         await self._queue.put(job_id)
         logger.info("任务 %s 已入队 (%s)", job_id, request.calc_type.value)
         return job_id
 
-    def get(self, job_id: str) -> Optional[dict]:
-        return self._jobs.get(job_id)
+    async def submit_group(
+        self, requests: List[JobRequest], labels: List[Optional[str]]
+    ) -> Tuple[str, List[str]]:
+        """批量提交为一个任务组，返回 (group_id, job_ids)"""
+        group_id = uuid.uuid4().hex
+        job_ids = [
+            await self.submit(req, group_id=group_id, label=label)
+            for req, label in zip(requests, labels)
+        ]
+        logger.info("任务组 %s 已提交 %d 个任务", group_id, len(job_ids))
+        return group_id, job_ids
 
-    def list_all(self) -> List[dict]:
-        return sorted(
-            self._jobs.values(), key=lambda x: x["created_at"], reverse=True
-        )
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = self._store.load(job_id)
+            if job is not None:
+                self._remember(job)
+        return job
+
+    def group(self, group_id: str) -> Optional[List[str]]:
+        """任务组内的 job_id（按提交顺序）；组不存在时返回 None"""
+        return self._store.group(group_id) or None
 
-    # ── 后台 worker ─────────────────────────────────────────
+    async def wait(self, job_id: str) -> JobRecord:
+        """等待任务进入终态（completed / failed）"""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.done is not None:
+            await job.done.wait()
+        return job
 
-    async def _worker(self) -> None:
+    def list_all(self, limit: int = 50, offset: int = 0, **filters: Any) -> List[JobRecord]:
+        """最近的任务（含重启前的历史），按创建时间倒序分页
+
+        filters 见 JobStore.recent（status / calc_type / created_from / created_to），
+        在库内过滤，单次请求的开销只与 limit 有关、与历史总量无关。
+        """
+        return [
+            self._jobs.get(rec.job_id, rec)
+            for rec in self._store.recent(limit, offset, **filters)
+        ]
+
+    # ── 远程 agent 租约 ─────────────────────────────────────
+
+    async def lease(self, worker_id: str, wait_seconds: float = 0) -> Optional[JobRecord]:
+        """为 agent 取出一个待执行任务并加租约；无任务时最多等待 wait_seconds"""
+        self._touch_agent(worker_id)
+        deadline = time.monotonic() + wait_seconds
         while True:
-            job_id = await self._queue.get()
+            try:
+                job_id = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                if time.monotonic() >= deadline:
+                    return None
+                await asyncio.sleep(0.25)
+                continue
+            self._queue.task_done()
             job = self._jobs.get(job_id)
-            if not job:
-                self._queue.task_done()
+            if not job or job.status != JobStatus.pending:
                 continue
+            job.lease_id = uuid.uuid4().hex
+            job.lease_expires = time.monotonic() + settings.lease_seconds
+            self._mark_running(job, worker_id)
+            self._agents[worker_id]["running"] += 1
+            logger.info("任务 %s 租给 agent %s", job_id, worker_id)
+            return job
 
-            job["status"] = JobStatus.running
-            logger.info("任务 %s 开始执行", job_id)
+    def heartbeat(self, job_id: str, lease_id: str) -> bool:
+        """续约；租约已失效（超时被回收或任务不存在）时返回 False"""
+        job = self._leased(job_id, lease_id)
+        if not job:
+            return False
+        job.lease_expires = time.monotonic() + settings.lease_seconds
+        self._touch_agent(job.worker)
+        return True
 
-            try:
-                request: JobRequest = job["request"]
-                paths = render_job_templates(job_id, request)
-                result: CalculationResult = await run_calculation(
-                    job_id, request, paths
+    def complete(self, job_id: str, lease_id: str, result: CalculationResult) -> bool:
+        job = self._leased(job_id, lease_id)
+        if not job:
+            return False
+        self._release(job, "completed")
+        self._finish(job, result=result)
+        return True
+
+    def fail(self, job_id: str, lease_id: str, error: str) -> bool:
+        job = self._leased(job_id, lease_id)
+        if not job:
+            return False
+        self._release(job, "failed")
+        self._finish(job, error=error)
+        return True
+
+    def concurrency(self) -> Optional[dict]:
+        """本机槽位的当前 / 目标并发数与自动调优测量结果"""
+        return self._tuner.status(self._target_slots, len(self._busy))
+
+    def agents(self) -> List[dict]:
+        return sorted(self._agents.values(), key=lambda a: a["worker_id"])
+
+    # ── 内部 ────────────────────────────────────────────────
+
+    def _touch_agent(self, worker_id: str) -> None:
+        agent = self._agents.setdefault(
+            worker_id,
+            {"worker_id": worker_id, "running": 0, "completed": 0, "failed": 0},
+        )
+        agent["last_seen"] = datetime.now().isoformat(timespec="seconds")
+
+    def _remember(self, job: JobRecord) -> None:
+        """登记到内存索引；超过 jobs.max_records 时丢弃最早的终态记录"""
+        self._jobs[job.job_id] = job
+        excess = len(self._jobs) - settings.jobs_max_records
+        if excess <= 0:
+            return
+        for job_id in [
+            jid for jid, j in itertools.islice(self._jobs.items(), 4 * excess)
+            if not j.active
+        ][:excess]:
+            del self._jobs[job_id]
+
+    def _leased(self, job_id: str, lease_id: str) -> Optional[JobRecord]:
+        job = self._jobs.get(job_id)
+        if (
+            not job
+            or job.status != JobStatus.running
+            or job.lease_id is None
+            or job.lease_id != lease_id
+        ):
+            return None
+        return job
+
+    def _release(self, job: JobRecord, outcome: str) -> None:
+        """结束租约并更新 agent 计数"""
+        agent = self._agents.get(job.worker)
+        if agent:
+            agent["running"] = max(0, agent["running"] - 1)
+            if outcome:
+                agent[outcome] += 1
+            agent["last_seen"] = datetime.now().isoformat(timespec="seconds")
+        job.lease_id = None
+        job.lease_expires = 0.0
+
+    def _mark_running(self, job: JobRecord, worker: str) -> None:
+        job.status = JobStatus.running
+        job.worker = worker
+        job.attempts += 1
+        job.started_ts = time.time()
+        self._store.save(job)
+        logger.info("任务 %s 开始执行 (worker=%s)", job.job_id, worker)
+
+    def _finish(
+        self,
+        job: JobRecord,
+        result: Optional[CalculationResult] = None,
+        error: Optional[str] = None,
+        exc_info: bool = False,
+    ) -> None:
+        if error is None:
+            job.result = result
+            job.status = JobStatus.completed
+            logger.info(
+                "任务 %s 完成, alpha_Ca=%.4f g", job.job_id, result.alpha_Ca_g
+            )
+            result_archive.append(job)
+        else:
+            job.error = error
+            job.status = JobStatus.failed
+            logger.error("任务 %s 失败: %s", job.job_id, error, exc_info=exc_info)
+        job.finished_ts = time.time()
+        try:
+            self._store.save(job)
+        except Exception:
+            logger.error("任务 %s 状态持久化失败", job.job_id, exc_info=True)
+        done, job.done = job.done, None
+        if done is not None:
+            done.set()
+
+    async def _reaper(self) -> None:
+        """回收超时租约：重新入队，超过 max_attempts 次则判定失败"""
+        while True:
+            await asyncio.sleep(max(1.0, settings.lease_seconds / 4))
+            now = time.monotonic()
+            for job in list(self._jobs.values()):
+                if job.lease_id is None or job.lease_expires > now:
+                    continue
+                worker = job.worker
+                self._release(job, "")
+                logger.warning("任务 %s 的 agent %s 租约超时", job.job_id, worker)
+                if job.attempts >= settings.max_attempts:
+                    self._finish(
+                        job, error=f"远程执行 {job.attempts} 次均未在租约内完成"
+                    )
+                    continue
+                job.status = JobStatus.pending
+                job.worker = None
+                self._store.save(job)
+                await self._queue.put(job.job_id)
+
+    async def _autotune(self) -> None:
+        """autotune.enabled 时按调优器的决定调整本机槽位数，并发布当前状态"""
+        while True:
+            await asyncio.sleep(_AUTOTUNE_TICK_SECONDS)
+            if settings.autotune_enabled and self._target_slots > 0:
+                target = self._tuner.step(self._target_slots)
+                if target != self._target_slots:
+                    logger.info("槽位自动调优 %d -> %d", self._target_slots, target)
+                    self._resize(target)
+            self._publish_concurrency()
+
+    def _publish_concurrency(self) -> None:
+        """单进程部署直接由 concurrency() 读取，无需发布"""
+
+    # ── 本机 worker ─────────────────────────────────────────
+
+    async def _worker(self, slot: int) -> None:
+        try:
+            while slot < self._target_slots:
+                job_id = await self._queue.get()
+                job = self._jobs.get(job_id)
+                if not job or job.status != JobStatus.pending:
+                    self._queue.task_done()
+                    continue
+
+                self._busy.add(slot)
+                token, completed = self._tuner.begin(), False
+                try:
+                    self._mark_running(job, LOCAL_WORKER)
+                    result = await execute_request(job_id, job.request)
+                    self._finish(job, result=result)
+                    completed = True
+                except Exception as exc:
+                    self._finish(job, error=str(exc), exc_info=True)
+                finally:
+                    self._tuner.end(token, completed)
+                    self._busy.discard(slot)
+                    self._queue.task_done()
+        finally:
+            if self._workers.get(slot) is asyncio.current_task():
+                del self._workers[slot]
+
+
+class SharedQueueJobManager(JobManager):
+    """scheduler.mode = external：jobs.db 即任务队列，多个 API 进程共用一个调度进程
+
+    API 进程（uvicorn 多 worker）只负责写入 pending 任务、读取状态，并替
+    远程 agent 在库中原子领取 / 续约 / 结束租约；调度进程（python -m
+    app.scheduler）以 start(scheduler=True) 启动，运行本机槽位与租约回收。
+    状态以数据库为准，get() 每次读取最新行。
+    """
+
+    def __init__(self, store: Optional[JobStore] = None) -> None:
+        super().__init__(store)
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    async def start(self, scheduler: bool = False) -> None:
+        if not scheduler:
+            logger.info("共享队列模式：本进程只提交与查询任务，由独立调度进程执行")
+            return
+        interrupted = self._store.recover(local_worker=LOCAL_WORKER)
+        if interrupted:
+            logger.warning("%d 个本机任务在调度进程上次停止时未完成，已标记为失败", interrupted)
+        self._resize(self._initial_slots(settings.snapshot))
+        self._reaper_task = asyncio.create_task(self._reaper())
+        self._autotune_task = asyncio.create_task(self._autotune())
+        self._publish_concurrency()
+        logger.info("调度进程已启动, 本机槽位=%d", self._target_slots)
+
+    async def stop(self) -> None:
+        if self._poller:
+            self._poller.cancel()
+            self._poller = None
+        await super().stop()
+
+    async def submit(
+        self,
+        request: JobRequest,
+        group_id: Optional[str] = None,
+        label: Optional[str] = None,
+        job_id: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> str:
+        job_id = job_id or uuid.uuid4().hex
+        self._store.create(
+            job_id,
+            request,
+            created_at=datetime.now().isoformat(timespec="seconds"),
+            submitted_ts=time.time(),
+            group_id=group_id,
+            label=label,
+            source=source,
+        )
+        logger.info("任务 %s 已写入共享队列 (%s)", job_id, request.calc_type.value)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        return self._store.load(job_id)
+
+    async def wait(self, job_id: str) -> JobRecord:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if not job.active:
+            return job
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(fut)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_waiters())
+        await fut
+        return self.get(job_id)
+
+    async def _poll_waiters(self) -> None:
+        """单个轮询任务批量检查所有被等待任务的状态"""
+        while self._waiters:
+            await asyncio.sleep(settings.scheduler_poll_seconds)
+            statuses = self._store.statuses(list(self._waiters))
+            for job_id, futures in list(self._waiters.items()):
+                status = statuses.get(job_id)
+                finished = status is None or status not in (
+                    JobStatus.pending, JobStatus.running
                 )
-                job["result"] = result
-                job["status"] = JobStatus.completed
-                logger.info("任务 %s 完成, alpha_Ca=%.4f g", job_id, result.alpha_Ca_g)
-            except Exception as exc:
-                job["error"] = str(exc)
-                job["status"] = JobStatus.failed
-                logger.error("任务 %s 失败: %s", job_id, exc, exc_info=True)
-            finally:
-                self._queue.task_done()
-
-
-# 全局单例
-job_manager = JobManager()
+                live = [f for f in futures if not f.done()]
+                if finished:
+                    for f in live:
+                        f.set_result(None)
+                    live = []
+                if live:
+                    self._waiters[job_id] = live
+                else:
+                    del self._waiters[job_id]
+
+    def list_all(self, limit: int = 50, offset: int = 0, **filters: Any) -> List[JobRecord]:
+        return self._store.recent(limit, offset, **filters)
+
+    async def lease(self, worker_id: str, wait_seconds: float = 0) -> Optional[JobRecord]:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            job = self._store.claim(worker_id, settings.lease_seconds)
+            if job is not None:
+                logger.info("任务 %s 租给 agent %s", job.job_id, worker_id)
+                return job
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(max(settings.scheduler_poll_seconds, 0.25))
+
+    def heartbeat(self, job_id: str, lease_id: str) -> bool:
+        return self._store.renew(job_id, lease_id, settings.lease_seconds)
+
+    def complete(self, job_id: str, lease_id: str, result: CalculationResult) -> bool:
+        job = self._store.settle(job_id, lease_id, result=result)
+        if job is None:
+            return False
+        logger.info("任务 %s 完成, alpha_Ca=%.4f g", job_id, result.alpha_Ca_g)
+        result_archive.append(job)
+        return True
+
+    def fail(self, job_id: str, lease_id: str, error: str) -> bool:
+        if self._store.settle(job_id, lease_id, error=error) is None:
+            return False
+        logger.error("任务 %s 失败: %s", job_id, error)
+        return True
+
+    def concurrency(self) -> Optional[dict]:
+        if self._reaper_task is None:
+            # API 进程：读取调度进程最近发布的状态
+            return self._store.load_state("concurrency")
+        return super().concurrency()
+
+    def _publish_concurrency(self) -> None:
+        try:
+            self._store.save_state("concurrency", super().concurrency())
+        except Exception:
+            logger.warning("发布槽位状态失败", exc_info=True)
+
+    def agents(self) -> List[dict]:
+        return self._store.worker_stats(exclude=LOCAL_WORKER)
+
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, settings.lease_seconds / 4))
+            for job_id, worker, requeued in self._store.expire_leases(settings.max_attempts):
+                logger.warning(
+                    "任务 %s 的 agent %s 租约超时%s",
+                    job_id, worker, "，重新入队" if requeued else "，判定失败",
+                )
+
+    async def _worker(self, slot: int) -> None:
+        try:
+            while slot < self._target_slots:
+                job = self._store.claim(LOCAL_WORKER)
+                if job is None:
+                    await asyncio.sleep(settings.scheduler_poll_seconds)
+                    continue
+                self._busy.add(slot)
+                logger.info("任务 %s 开始执行 (worker=%s)", job.job_id, LOCAL_WORKER)
+                token, completed = self._tuner.begin(), False
+                try:
+                    result = await execute_request(job.job_id, job.request)
+                    self._finish(job, result=result)
+                    completed = True
+                except Exception as exc:
+                    self._finish(job, error=str(exc), exc_info=True)
+                finally:
+                    self._tuner.end(token, completed)
+                    self._busy.discard(slot)
+        finally:
+            if self._workers.get(slot) is asyncio.current_task():
+                del self._workers[slot]
+
+
+# 全局单例（调度模式在进程启动时确定）
+job_manager: JobManager = (
+    SharedQueueJobManager() if settings.scheduler_mode == "external" else JobManager()
+)
@@ -0,0 +1,554 @@
+# -*- coding: utf-8 -*-
+"""任务记录：紧凑的内存结构 + SQLite 持久化 + 请求 / 结果按 LRU 驻留
+
+JobRecord 用 __slots__ 保存调度所需的少量标量字段；体积较大的
+JobRequest / CalculationResult（以及已序列化的 HTTP 响应缓存）只在
+最近使用的 jobs.resident 个任务上保留，其余在需要时从
+work_root/jobs.db 透明加载。进行中（pending / running）的任务始终驻留。
+
+JobManager 只在内存中保留最近 jobs.max_records 条记录；更早的任务
+按 job_id 查询时从数据库重建。服务重启后历史任务仍可查询，重启前
+未完成的任务标记为失败。
+
+scheduler.mode = external 时数据库同时是多进程共享的任务队列：
+pending 行即待执行任务，claim() 在 BEGIN IMMEDIATE 事务内原子领取，
+远程 agent 的租约（lease_id / lease_expires，epoch 秒）也记录在库中。
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..models import CalcType, CalculationResult, JobRequest, JobStatus
+
+logger = logging.getLogger(__name__)
+
+_ACTIVE = (JobStatus.pending, JobStatus.running)
+
+# (列名, 类型)；request / result 为 JSON 文本
+_COLUMNS = (
+    ("job_id", "TEXT PRIMARY KEY"),
+    ("status", "TEXT NOT NULL"),
+    ("calc_type", "TEXT NOT NULL"),
+    ("created_at", "TEXT NOT NULL"),
+    ("worker", "TEXT"),
+    ("error", "TEXT"),
+    ("label", "TEXT"),
+    ("group_id", "TEXT"),
+    ("attempts", "INTEGER NOT NULL"),
+    ("submitted_ts", "REAL NOT NULL"),
+    ("started_ts", "REAL"),
+    ("finished_ts", "REAL"),
+    # 任务来源：NULL = 直接提交；study = 研究任务的计算点（不进结果归档）
+    ("source", "TEXT"),
+    ("request", "TEXT NOT NULL"),
+    ("result", "TEXT"),
+    # 共享队列模式下的远程租约
+    ("lease_id", "TEXT"),
+    ("lease_expires", "REAL"),
+)
+_META = [
+    name for name, _ in _COLUMNS
+    if name not in ("request", "result", "lease_id", "lease_expires")
+]
+_RUNNING = JobStatus.running.value
+
+SOURCE_STUDY = "study"
+_PENDING = JobStatus.pending.value
+
+
+class JobRecord:
+    """单个任务的状态；request / result 属性在被淘汰后按需从数据库加载"""
+
+    __slots__ = (
+        "job_id", "status", "calc_type", "created_at", "worker", "error",
+        "label", "group_id", "attempts", "submitted_ts", "started_ts",
+        "finished_ts", "source", "lease_id", "lease_expires", "done", "http_cache",
+        "_request", "_result", "_store",
+    )
+
+    def __init__(
+        self,
+        store: "JobStore",
+        job_id: str,
+        status: JobStatus,
+        calc_type: CalcType,
+        created_at: str,
+        submitted_ts: float,
+        worker: Optional[str] = None,
+        error: Optional[str] = None,
+        label: Optional[str] = None,
+        group_id: Optional[str] = None,
+        attempts: int = 0,
+        started_ts: Optional[float] = None,
+        finished_ts: Optional[float] = None,
+        source: Optional[str] = None,
+    ) -> None:
+        self._store = store
+        self.job_id = job_id
+        self.status = status
+        self.calc_type = calc_type
+        self.created_at = created_at
+        self.submitted_ts = submitted_ts
+        self.worker = worker
+        self.error = error
+        self.label = label
+        self.group_id = group_id
+        self.attempts = attempts
+        self.started_ts = started_ts
+        self.finished_ts = finished_ts
+        self.source = source
+        self.lease_id: Optional[str] = None
+        self.lease_expires = 0.0
+        # 仅进行中的任务持有 Event；进入终态后置 None
+        self.done: Optional[asyncio.Event] = None
+        self.http_cache: Optional[Tuple[bytes, str]] = None
+        self._request: Optional[JobRequest] = None
+        self._result: Optional[CalculationResult] = None
+
+    @property
+    def request(self) -> JobRequest:
+        if self._request is None:
+            self._store.load_payload(self)
+        else:
+            self._store.touch(self)
+        return self._request
+
+    @property
+    def result(self) -> Optional[CalculationResult]:
+        if self._result is None and self.status == JobStatus.completed:
+            self._store.load_payload(self)
+        elif self._request is not None:
+            self._store.touch(self)
+        return self._result
+
+    @result.setter
+    def result(self, value: Optional[CalculationResult]) -> None:
+        self._result = value
+
+    @property
+    def active(self) -> bool:
+        return self.status in _ACTIVE
+
+    def evict(self) -> None:
+        self._request = None
+        self._result = None
+        self.http_cache = None
+
+
+class JobStore:
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # job_id → 记录；按最近使用排序，超过 jobs.resident 时淘汰最旧的终态任务
+        self._resident: "OrderedDict[str, JobRecord]" = OrderedDict()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = self._path or settings.work_root / "jobs.db"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                + ", ".join(f"{n} {t}" for n, t in _COLUMNS) + ")"
+            )
+            # 旧版本库补齐新增列
+            existing = {r[1] for r in conn.execute("PRAGMA table_info(jobs)")}
+            for name, decl in _COLUMNS:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_group ON jobs(group_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS studies ("
+                " study_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduler_state ("
+                " key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    # ── 写入 ────────────────────────────────────────────────
+
+    def create(
+        self,
+        job_id: str,
+        request: JobRequest,
+        created_at: str,
+        submitted_ts: float,
+        group_id: Optional[str],
+        label: Optional[str],
+        source: Optional[str] = None,
+    ) -> JobRecord:
+        rec = JobRecord(
+            self, job_id, JobStatus.pending, request.calc_type, created_at,
+            submitted_ts, label=label, group_id=group_id, source=source,
+        )
+        rec._request = request
+        with self._lock:
+            db = self._db()
+            db.execute(
+                f"INSERT INTO jobs ({', '.join(_META)}, request) "
+                f"VALUES ({', '.join('?' * (len(_META) + 1))})",
+                (*self._meta_values(rec), request.model_dump_json()),
+            )
+            db.commit()
+        self.touch(rec)
+        return rec
+
+    def save(self, rec: JobRecord) -> None:
+        """状态变化后持久化（完成时一并写入结果）"""
+        assignments = ", ".join(f"{n} = ?" for n in _META[1:])
+        params: List[Any] = self._meta_values(rec)[1:]
+        if rec._result is not None:
+            assignments += ", result = ?"
+            params.append(rec._result.model_dump_json())
+        with self._lock:
+            db = self._db()
+            db.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*params, rec.job_id))
+            db.commit()
+
+    @staticmethod
+    def _meta_values(rec: JobRecord) -> List[Any]:
+        return [
+            rec.job_id, rec.status.value, rec.calc_type.value, rec.created_at,
+            rec.worker, rec.error, rec.label, rec.group_id, rec.attempts,
+            rec.submitted_ts, rec.started_ts, rec.finished_ts, rec.source,
+        ]
+
+    def recover(self, local_worker: Optional[str] = None) -> int:
+        """启动时把上次运行中断的任务标记为失败，返回条数
+
+        给出 local_worker 时（共享队列的调度进程）只处理该 worker 名下
+        执行中的任务：pending 行仍是有效队列，agent 租约由回收逻辑处理；
+        研究运行在 API 进程中，由 API 进程按心跳回收（fail_stale_studies）。
+        """
+        failed = (JobStatus.failed.value, "服务重启，任务未完成")
+        with self._lock:
+            db = self._db()
+            if local_worker is None:
+                cur = db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_id = NULL"
+                    " WHERE status IN (?, ?)",
+                    (*failed, _PENDING, _RUNNING),
+                )
+                db.execute(
+                    "UPDATE studies SET data = json_set(data, '$.status', ?, '$.error', ?)"
+                    " WHERE json_extract(data, '$.status') IN (?, ?)",
+                    (*failed, _PENDING, _RUNNING),
+                )
+            else:
+                cur = db.execute(
+                    "UPDATE jobs SET status = ?, error = ? WHERE status = ? AND worker = ?",
+                    (*failed, _RUNNING, local_worker),
+                )
+            db.commit()
+        return cur.rowcount
+
+    # ── 共享队列 ────────────────────────────────────────────
+
+    def claim(
+        self, worker: str, lease_seconds: Optional[float] = None
+    ) -> Optional[JobRecord]:
+        """原子领取最早的 pending 任务；lease_seconds 非空时同时登记租约"""
+        lease_id = uuid.uuid4().hex if lease_seconds else None
+        expires = time.time() + lease_seconds if lease_seconds else None
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT job_id FROM jobs WHERE status = ? ORDER BY rowid LIMIT 1",
+                    (_PENDING,),
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1,"
+                        " started_ts = ?, lease_id = ?, lease_expires = ? WHERE job_id = ?",
+                        (_RUNNING, worker, time.time(), lease_id, expires, row[0]),
+                    )
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        if row is None:
+            return None
+        rec = self.load(row[0])
+        rec.lease_id = lease_id
+        return rec
+
+    def renew(self, job_id: str, lease_id: str, lease_seconds: float) -> bool:
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE jobs SET lease_expires = ?"
+                " WHERE job_id = ? AND status = ? AND lease_id = ?",
+                (time.time() + lease_seconds, job_id, _RUNNING, lease_id),
+            )
+            db.commit()
+        return cur.rowcount == 1
+
+    def settle(
+        self,
+        job_id: str,
+        lease_id: str,
+        result: Optional[CalculationResult] = None,
+        error: Optional[str] = None,
+    ) -> Optional[JobRecord]:
+        """按租约结束任务；租约已失效时返回 None"""
+        status = JobStatus.failed if error is not None else JobStatus.completed
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, finished_ts = ?,"
+                " lease_id = NULL WHERE job_id = ? AND status = ? AND lease_id = ?",
+                (status.value, error,
+                 result.model_dump_json() if result is not None else None,
+                 time.time(), job_id, _RUNNING, lease_id),
+            )
+            db.commit()
+        if cur.rowcount != 1:
+            return None
+        rec = self.load(job_id)
+        rec._result = result
+        return rec
+
+    def expire_leases(self, max_attempts: int) -> List[Tuple[str, str, bool]]:
+        """回收超时租约：返回 [(job_id, worker, 是否重新入队)]，超过次数的判定失败"""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(
+                    "SELECT job_id, worker, attempts FROM jobs"
+                    " WHERE status = ? AND lease_id IS NOT NULL AND lease_expires <= ?",
+                    (_RUNNING, now),
+                ).fetchall()
+                out = []
+                for job_id, worker, attempts in rows:
+                    if attempts >= max_attempts:
+                        db.execute(
+                            "UPDATE jobs SET status = ?, error = ?, finished_ts = ?,"
+                            " lease_id = NULL WHERE job_id = ?",
+                            (JobStatus.failed.value,
+                             f"远程执行 {attempts} 次均未在租约内完成", now, job_id),
+                        )
+                    else:
+                        db.execute(
+                            "UPDATE jobs SET status = ?, worker = NULL, lease_id = NULL"
+                            " WHERE job_id = ?",
+                            (_PENDING, job_id),
+                        )
+                    out.append((job_id, worker, attempts < max_attempts))
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return out
+
+    def statuses(self, job_ids: List[str]) -> Dict[str, JobStatus]:
+        out: Dict[str, JobStatus] = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(job_ids), 500):
+                chunk = job_ids[i:i + 500]
+                rows = db.execute(
+                    f"SELECT job_id, status FROM jobs WHERE job_id IN"
+                    f" ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                out.update((jid, JobStatus(st)) for jid, st in rows)
+        return out
+
+    def recent(
+        self,
+        limit: int,
+        offset: int = 0,
+        status: Optional[JobStatus] = None,
+        calc_type: Optional[CalcType] = None,
+        created_from: Optional[str] = None,
+        created_to: Optional[str] = None,
+    ) -> List[JobRecord]:
+        """最近提交的任务（按创建时间倒序），过滤条件在库内执行
+
+        created_from / created_to 为 ISO 时间字符串（含端点），按字符串比较。
+        """
+        where, params = [], []
+        for clause, value in (
+            ("status = ?", status.value if status else None),
+            ("calc_type = ?", calc_type.value if calc_type else None),
+            ("created_at >= ?", created_from),
+            ("created_at <= ?", created_to),
+        ):
+            if value:
+                where.append(clause)
+                params.append(value)
+        sql = f"SELECT {', '.join(_META)} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db().execute(
+                sql + " ORDER BY rowid DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+            ).fetchall()
+        return [self._record(dict(zip(_META, row))) for row in rows]
+
+    def worker_stats(self, exclude: str) -> List[Dict[str, Any]]:
+        """按 worker 汇总执行中 / 完成 / 失败数（共享队列模式的 agent 列表）"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT worker, status, COUNT(*),"
+                " MAX(COALESCE(finished_ts, started_ts)) FROM jobs"
+                " WHERE worker IS NOT NULL AND worker != ? GROUP BY worker, status",
+                (exclude,),
+            ).fetchall()
+        agents: Dict[str, Dict[str, Any]] = {}
+        for worker, status, n, seen in rows:
+            a = agents.setdefault(worker, {
+                "worker_id": worker, "running": 0, "completed": 0, "failed": 0,
+                "last_seen": 0.0,
+            })
+            if status in a:
+                a[status] = n
+            a["last_seen"] = max(a["last_seen"], seen or 0.0)
+        for a in agents.values():
+            a["last_seen"] = datetime.fromtimestamp(a["last_seen"]).isoformat(
+                timespec="seconds"
+            )
+        return sorted(agents.values(), key=lambda a: a["worker_id"])
+
+    # ── 研究任务 ────────────────────────────────────────────
+
+    def save_study(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO studies VALUES (?, ?)",
+                (data["study_id"], json.dumps(data, ensure_ascii=False)),
+            )
+            db.commit()
+
+    def fail_stale_studies(self, before: float) -> int:
+        """把心跳早于 before 的未结束研究标记为失败（所属 API 进程已退出），返回条数"""
+        with self._lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE studies SET data = json_set(data, '$.status', ?, '$.error', ?)"
+                " WHERE json_extract(data, '$.status') IN (?, ?)"
+                " AND COALESCE(json_extract(data, '$.heartbeat'), 0) < ?",
+                (JobStatus.failed.value, "所在 API 进程已退出，研究未完成",
+                 _PENDING, _RUNNING, before),
+            )
+            db.commit()
+        return cur.rowcount
+
+    def load_study(self, study_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT data FROM studies WHERE study_id = ?", (study_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ── 调度进程状态（供 API 进程查询） ─────────────────────
+
+    def save_state(self, key: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO scheduler_state VALUES (?, ?)",
+                (key, json.dumps(data, ensure_ascii=False)),
+            )
+            db.commit()
+
+    def load_state(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT data FROM scheduler_state WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ── 读取 ────────────────────────────────────────────────
+
+    def load(self, job_id: str) -> Optional[JobRecord]:
+        """按 job_id 重建记录（不加载 request / result）"""
+        with self._lock:
+            row = self._db().execute(
+                f"SELECT {', '.join(_META)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._record(dict(zip(_META, row)))
+
+    def _record(self, r: Dict[str, Any]) -> JobRecord:
+        return JobRecord(
+            self, r["job_id"], JobStatus(r["status"]), CalcType(r["calc_type"]),
+            r["created_at"], r["submitted_ts"], worker=r["worker"], error=r["error"],
+            label=r["label"], group_id=r["group_id"], attempts=r["attempts"],
+            started_ts=r["started_ts"], finished_ts=r["finished_ts"],
+            source=r["source"],
+        )
+
+    def group(self, group_id: str) -> List[str]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT job_id FROM jobs WHERE group_id = ? ORDER BY rowid", (group_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def load_payload(self, rec: JobRecord) -> None:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT request, result FROM jobs WHERE job_id = ?", (rec.job_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"任务 {rec.job_id} 不在任务库中")
+        rec._request = JobRequest.model_validate_json(row[0])
+        rec._result = CalculationResult.model_validate_json(row[1]) if row[1] else None
+        self.touch(rec)
+
+    # ── 驻留管理 ────────────────────────────────────────────
+
+    def touch(self, rec: JobRecord) -> None:
+        self._resident[rec.job_id] = rec
+        self._resident.move_to_end(rec.job_id)
+        limit = max(1, settings.jobs_resident)
+        # 从最久未用处淘汰终态任务；进行中的任务移到队尾（至多检查一轮）
+        skipped = 0
+        while len(self._resident) > limit and skipped < len(self._resident):
+            job_id, old = next(iter(self._resident.items()))
+            if old.active:
+                self._resident.move_to_end(job_id)
+                skipped += 1
+                continue
+            old.evict()
+            del self._resident[job_id]
+
+    def resident_count(self) -> int:
+        return len(self._resident)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._resident.clear()
+
+
+# 全局单例
+job_store = JobStore()
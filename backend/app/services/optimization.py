@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""约束 Ca 最小化：同时满足 Al 窗口与 S 上限的最小 Ca 用量
+
+单次 FactSage 计算只能求一个目标（脱氧 Al 或脱硫 S）下的 Ca 需要量，
+因此每个候选炉次拆成最多三次计算：
+
+  - 脱氧，目标 Al = al_min 与 al_max → Al 落在窗口内对应的 Ca 区间；
+  - 脱硫，目标 S = s_max → S 不超过上限所需的最少 Ca。
+
+假定 Ca 用量随目标含量单调变化，则最小可行 Ca = max(Ca_S, Ca 区间下端)，
+且不得超过 Ca 区间上端；超出部分作为违约量按 _PENALTY 倍计入目标函数。
+约束裕量以 Ca 克数表示，Al 含量由窗口两端点线性插值估算。
+
+给出自由变量（如渣中 CaO_g 及其范围）时，在范围内做坐标模式搜索：
+每轮把当前点沿各变量 ±步长 的全部候选一次提交，由本机槽位与远程
+agent 并行执行；取最优者移动，无改进则步长减半，直到步长小于
+min_step 或达到 max_iterations。已算过的点由研究缓存复用。
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from ..models import CalcType, JobRequest, JobStatus, OptimizeRequest
+from .columns import NUMERIC_INPUT_COLUMNS, flatten_request, request_from_row
+from .studies import Study
+
+# 违约 1 g Ca 折合的目标函数代价（g Ca）
+_PENALTY = 10.0
+# 目标值由约束决定，不能作为自由变量
+_NOT_FREE = {"target_value", "alpha_guess"}
+
+Point = Tuple[float, ...]
+
+
+def _targets(body: OptimizeRequest) -> List[Tuple[str, str, float]]:
+    """每个候选点需要的计算：(约束名, 目标元素, 目标值)"""
+    targets = []
+    if body.al_min is not None:
+        targets.append(("al_min", "Al", body.al_min))
+        if body.al_max != body.al_min:
+            targets.append(("al_max", "Al", body.al_max))
+    if body.s_max is not None:
+        targets.append(("s_max", "S", body.s_max))
+    return targets
+
+
+def _request(
+    base_row: Dict[str, Any], free: Dict[str, float], element: str, value: float
+) -> JobRequest:
+    row = {**base_row, **free}
+    row["calc_type"] = (
+        CalcType.deoxidation if element == "Al" else CalcType.desulfurization
+    ).value
+    row["target_element"] = element
+    row["target_value"] = value
+    try:
+        return request_from_row(row)
+    except ValidationError as exc:
+        msg = "; ".join(e["msg"] for e in exc.errors())
+        raise ValueError(f"候选点 {free} 超出输入允许范围: {msg}") from None
+
+
+def plan_optimization(body: OptimizeRequest) -> Dict[str, Tuple[float, float]]:
+    """校验约束与自由变量，返回 {变量: (下限, 上限)}；非法时抛出 ValueError"""
+    if (body.al_min is None) != (body.al_max is None):
+        raise ValueError("Al 窗口需同时给出 al_min 与 al_max")
+    if body.al_min is None and body.s_max is None:
+        raise ValueError("至少需要 Al 窗口或 S 上限之一")
+    if body.al_min is not None and body.al_min > body.al_max:
+        raise ValueError("al_min 不能大于 al_max")
+    if body.min_step > body.initial_step:
+        raise ValueError("min_step 不能大于 initial_step")
+
+    bounds = {}
+    for var, rng in body.free.items():
+        if var not in NUMERIC_INPUT_COLUMNS or var in _NOT_FREE:
+            raise ValueError(f"不能作为自由变量的列: {var}")
+        if len(rng) != 2 or not rng[0] < rng[1]:
+            raise ValueError(f"{var} 的范围须为 [下限, 上限] 且下限小于上限")
+        bounds[var] = (float(rng[0]), float(rng[1]))
+
+    # 范围两端必须是合法输入
+    base_row = flatten_request(body.base)
+    for var, (lo, hi) in bounds.items():
+        for value in (lo, hi):
+            for _, element, target in _targets(body):
+                _request(base_row, {var: value}, element, target)
+    return bounds
+
+
+def _assess(body: OptimizeRequest, need: Dict[str, float]) -> Dict[str, Any]:
+    """由各约束单独所需的 Ca 求最小可行 Ca、违约量与约束裕量"""
+    floor, ceiling = [], math.inf
+    margins: Dict[str, float] = {}
+    if "s_max" in need:
+        floor.append(need["s_max"])
+    if body.al_min is not None:
+        a_min = need["al_min"]
+        a_max = need.get("al_max", a_min)
+        floor.append(min(a_min, a_max))
+        ceiling = max(a_min, a_max)
+    ca = max(floor)
+    violation = max(0.0, ca - ceiling)
+
+    binding = "S" if "s_max" in need and need["s_max"] >= max(floor) else "Al"
+    estimated_al = None
+    if body.al_min is not None:
+        # 裕量为正表示 Ca 在该端点的可行一侧
+        if a_min <= a_max:
+            margins["al_min"], margins["al_max"] = ca - a_min, a_max - ca
+        else:
+            margins["al_min"], margins["al_max"] = a_min - ca, ca - a_max
+        estimated_al = body.al_min
+        if a_max != a_min:
+            estimated_al += (ca - a_min) * (body.al_max - body.al_min) / (a_max - a_min)
+    if "s_max" in need:
+        margins["s_max"] = ca - need["s_max"]
+    return {
+        "alpha_Ca_g": ca,
+        "feasible": violation == 0,
+        "violation_g": violation,
+        "binding": binding,
+        "margins_g": margins,
+        "estimated_Al_wtpct": estimated_al,
+        "requirements_g": need,
+        "cost": ca + _PENALTY * violation,
+    }
+
+
+async def _evaluate(
+    study: Study,
+    body: OptimizeRequest,
+    names: List[str],
+    points: List[Point],
+    cache: Dict[Point, Dict[str, Any]],
+) -> None:
+    """一次提交所有未评估候选点的全部计算，结果写入 cache"""
+    base_row = flatten_request(body.base)
+    pending = [p for p in dict.fromkeys(points) if p not in cache]
+    batch: List[Tuple[Point, str, JobRequest]] = []
+    for p in pending:
+        free = dict(zip(names, p))
+        for key, element, value in _targets(body):
+            batch.append((p, key, _request(base_row, free, element, value)))
+
+    jobs = await study.evaluate([req for _, _, req in batch])
+    need: Dict[Point, Dict[str, float]] = {p: {} for p in pending}
+    job_ids: Dict[Point, Dict[str, str]] = {p: {} for p in pending}
+    errors: Dict[Point, str] = {}
+    for (p, key, _), job in zip(batch, jobs):
+        if job.status != JobStatus.completed:
+            errors.setdefault(p, f"{key}: {job.error}")
+            continue
+        need[p][key] = job.result.alpha_Ca_g
+        job_ids[p][key] = job.job_id
+
+    for p in pending:
+        free = dict(zip(names, p))
+        if p in errors:
+            # 计算失败的候选点视为不可行
+            cache[p] = {"free": free, "feasible": False, "cost": math.inf, "error": errors[p]}
+        else:
+            cache[p] = {"free": free, **_assess(body, need[p]), "jobs": job_ids[p]}
+
+
+def _clip(value: float, lo: float, hi: float) -> float:
+    return round(min(max(value, lo), hi), 9)
+
+
+async def run_optimization(study: Study, body: OptimizeRequest) -> Dict[str, Any]:
+    bounds = plan_optimization(body)
+    names = list(bounds)
+    span = [hi - lo for lo, hi in bounds.values()]
+    base_row = flatten_request(body.base)
+    x: Point = tuple(_clip(float(base_row[v]), *bounds[v]) for v in names)
+    step = [body.initial_step * s for s in span]
+    cache: Dict[Point, Dict[str, Any]] = {}
+
+    await _evaluate(study, body, names, [x], cache)
+    if math.isinf(cache[x]["cost"]):
+        raise RuntimeError(f"起始点计算失败（{cache[x]['error']}）")
+
+    def _trace(iteration: int) -> Dict[str, Any]:
+        best = cache[x]
+        return {
+            "iteration": iteration,
+            "free": best["free"],
+            "alpha_Ca_g": best["alpha_Ca_g"],
+            "feasible": best["feasible"],
+        }
+
+    trace = [_trace(0)]
+    iterations = 0
+    while names and iterations < body.max_iterations:
+        if all(s < body.min_step * w for s, w in zip(step, span)):
+            break
+        iterations += 1
+        candidates = []
+        for i, var in enumerate(names):
+            for sign in (1, -1):
+                y = list(x)
+                y[i] = _clip(x[i] + sign * step[i], *bounds[var])
+                if tuple(y) != x:
+                    candidates.append(tuple(y))
+        await _evaluate(study, body, names, candidates, cache)
+
+        best = min(candidates, key=lambda p: cache[p]["cost"], default=x)
+        if cache[best]["cost"] < cache[x]["cost"]:
+            x = best
+            trace.append(_trace(iterations))
+        else:
+            step = [s / 2 for s in step]
+
+    optimum = {k: v for k, v in cache[x].items() if k != "cost"}
+    return {
+        "constraints": {"al_min": body.al_min, "al_max": body.al_max, "s_max": body.s_max},
+        "bounds": {v: list(b) for v, b in bounds.items()},
+        "optimum": optimum,
+        "iterations": iterations,
+        "converged": all(s < body.min_step * w for s, w in zip(step, span)),
+        "step": dict(zip(names, step)),
+        "points": len(cache),
+        "failed_points": sum(1 for c in cache.values() if "error" in c),
+        "trace": trace,
+    }
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""请求录制：把 /api/calculate 的请求体与到达时间追加到滚动 JSONL 日志
+
+每行一条::
+
+    {"ts": 1760000000.123, "path": "/api/calculate", "body": {...}}
+
+文件按 recording.max_bytes 滚动，保留 recording.backup_count 个历史文件
+（calculate.jsonl、calculate.jsonl.1 …，序号越大越旧）。server.workers > 1
+时每个 API 进程写各自的 calculate-<pid>.jsonl，避免多个进程滚动同一文件。写盘经
+QueueHandler 交给后台线程，不阻塞事件循环。录制文件可由
+benchmarks/replay.py 按原始时间间隔（或加速）重放。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Optional
+
+from ..config import ConfigSnapshot, settings
+
+logger = logging.getLogger(__name__)
+
+RECORDED_PATHS = frozenset({"/api/calculate"})
+RECORDING_FILE = "calculate.jsonl"
+
+# 超过该大小的请求体不录制（正常请求不足 1 KB）
+_MAX_BODY_BYTES = 64 * 1024
+
+
+def _file_name(cfg: ConfigSnapshot) -> str:
+    if cfg.server_workers > 1:
+        stem, ext = os.path.splitext(RECORDING_FILE)
+        return f"{stem}-{os.getpid()}{ext}"
+    return RECORDING_FILE
+
+
+class RequestRecorder:
+    def __init__(self) -> None:
+        self._log = logging.getLogger("factsage_ca.recording")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        settings.on_reload(self._on_config_reload)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.recording_enabled
+
+    def record(self, path: str, ts: float, body: bytes) -> None:
+        if self._listener is None:
+            self._open()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = body.decode("utf-8", errors="replace")
+        self._log.info(
+            json.dumps({"ts": round(ts, 3), "path": path, "body": payload},
+                       ensure_ascii=False)
+        )
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+        for handler in list(self._log.handlers):
+            self._log.removeHandler(handler)
+
+    def _open(self) -> None:
+        cfg = settings.snapshot
+        cfg.recording_dir.mkdir(parents=True, exist_ok=True)
+        path = cfg.recording_dir / _file_name(cfg)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=cfg.recording_max_bytes,
+            backupCount=cfg.recording_backup_count,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        self._log.addHandler(logging.handlers.QueueHandler(q))
+        self._listener = logging.handlers.QueueListener(q, file_handler)
+        self._listener.start()
+        logger.info("请求录制已开启: %s", path)
+
+    def _on_config_reload(self, old: ConfigSnapshot, new: ConfigSnapshot) -> None:
+        # 目录 / 滚动参数变化或关闭录制时释放文件，下次录制按新配置打开
+        keys = ("recording_enabled", "recording_dir",
+                "recording_max_bytes", "recording_backup_count")
+        if any(getattr(old, k) != getattr(new, k) for k in keys):
+            self.close()
+
+
+class RecordingMiddleware:
+    """纯 ASGI 中间件：透传请求体的同时收集一份，请求体读完即记录"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in RECORDED_PATHS
+            or not recorder.enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.time()
+        chunks = []
+        size = 0
+        recorded = False
+
+        async def receive_and_capture():
+            nonlocal size, recorded
+            message = await receive()
+            if message["type"] == "http.request" and not recorded:
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= _MAX_BODY_BYTES:
+                    chunks.append(body)
+                if not message.get("more_body", False):
+                    recorded = True
+                    if size <= _MAX_BODY_BYTES:
+                        try:
+                            recorder.record(scope["path"], arrived, b"".join(chunks))
+                        except Exception:
+                            logger.error("请求录制失败", exc_info=True)
+            return message
+
+        await self.app(scope, receive_and_capture, send)
+
+
+# 全局单例
+recorder = RequestRecorder()
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""列式结果归档：已完成任务按日分区写入 Parquet，供聚合查询使用
+
+目录结构（hive 分区）::
+
+    archive/date=2026-03-01/part-20260301T101500-4242-1a2b3c4d.parquet
+
+每行一条任务：任务元数据 + 全部输入列 + 全部结果列（见 columns.py）。
+写入先进入内存缓冲，达到 archive.flush_rows 行或 archive.flush_seconds
+秒后落盘；查询同时覆盖已落盘文件与本进程的缓冲区。pyarrow 为可选依赖。
+
+scheduler.mode = external 时调度进程与每个 API 进程（agent 回传结果）都会
+写入：文件名带进程号与随机后缀，互不覆盖；先写入以 "." 开头的临时文件再
+改名，查询扫描时 pyarrow 忽略这类文件，不会读到写了一半的 Parquet。
+分区合并只由调度进程（embedded 模式下即唯一进程）执行，且只处理开始时
+列出的文件，合并期间其他进程新写入的文件不受影响。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from .columns import (
+    INPUT_COLUMNS,
+    NUMERIC_INPUT_COLUMNS,
+    RESULT_COLUMNS,
+    flatten_request,
+    flatten_result,
+)
+from .job_store import SOURCE_STUDY, JobRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+META_COLUMNS = ["job_id", "group_id", "heat_id", "worker", "created_at"]
+STRING_COLUMNS = ["job_id", "group_id", "heat_id", "worker",
+                  "calc_type", "Mn_field", "target_element"]
+NUMERIC_COLUMNS = [*NUMERIC_INPUT_COLUMNS, *RESULT_COLUMNS]
+AGGREGATES = ("mean", "min", "max", "sum", "stddev", "count", "approximate_median")
+
+# 已关闭（早于今天）的分区内文件数超过该值时在启动时合并
+_COMPACT_MIN_FILES = 4
+
+
+def _schema() -> "pa.Schema":
+    fields = []
+    for name in [*META_COLUMNS, *INPUT_COLUMNS, *RESULT_COLUMNS]:
+        if name == "created_at":
+            fields.append(pa.field(name, pa.timestamp("s")))
+        elif name in STRING_COLUMNS:
+            fields.append(pa.field(name, pa.string()))
+        else:
+            fields.append(pa.field(name, pa.float64()))
+    return pa.schema(fields)
+
+
+def _write_atomic(table: "pa.Table", path) -> None:
+    """经同目录下 "." 开头的临时文件写入后改名（pyarrow 数据集默认忽略 . / _ 前缀）"""
+    tmp = path.with_name(f".{path.name}.tmp")
+    try:
+        pq.write_table(table, tmp, compression="zstd")
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+class ResultArchive:
+    """按日分区的 Parquet 归档（可多进程写入，单进程合并）"""
+
+    def __init__(self) -> None:
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return pa is not None and settings.archive_enabled
+
+    # ── 生命周期 ────────────────────────────────────────────
+
+    async def start(self, compact: bool = True) -> None:
+        """compact=False 用于共享队列模式的 API 进程：分区合并只由调度进程执行"""
+        if not self.enabled:
+            logger.info("结果归档未启用（archive.enabled 或缺少 pyarrow）")
+            return
+        settings.archive_dir.mkdir(parents=True, exist_ok=True)
+        if compact:
+            await asyncio.to_thread(self._compact_closed_days)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info("结果归档已启用: %s", settings.archive_dir)
+
+    async def stop(self) -> None:
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self.enabled:
+            await self.flush()
+
+    # ── 写入 ────────────────────────────────────────────────
+
+    def append(self, job: JobRecord) -> None:
+        """记录一条已完成任务（仅进缓冲，由后台任务落盘）
+
+        研究任务的扰动 / 候选计算点不是真实炉次，不进归档。
+        """
+        if not self.enabled or job.source == SOURCE_STUDY:
+            return
+        self._buffer.append({
+            "job_id": job.job_id,
+            "group_id": job.group_id,
+            "heat_id": job.label,
+            "worker": job.worker,
+            "created_at": datetime.fromisoformat(job.created_at),
+            **flatten_request(job.request),
+            **flatten_result(job.result),
+        })
+        if len(self._buffer) >= settings.archive_flush_rows:
+            asyncio.get_running_loop().create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self._lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception:
+                # 写盘失败时放回缓冲，下一轮重试
+                self._buffer[:0] = rows
+                logger.error("归档写入失败，%d 行保留在缓冲区", len(rows), exc_info=True)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.archive_flush_seconds)
+            await self.flush()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        by_day: Dict[date, List[Dict[str, Any]]] = {}
+        for r in rows:
+            by_day.setdefault(r["created_at"].date(), []).append(r)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        for day, day_rows in by_day.items():
+            part = settings.archive_dir / f"date={day.isoformat()}"
+            part.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pylist(day_rows, schema=_schema())
+            path = part / f"part-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+            _write_atomic(table, path)
+        logger.info("归档落盘 %d 行", len(rows))
+
+    def _compact_closed_days(self) -> None:
+        """合并历史分区中的小文件，减少查询时的文件打开次数"""
+        today = f"date={date.today().isoformat()}"
+        for part in sorted(settings.archive_dir.glob("date=*")):
+            files = sorted(part.glob("*.parquet"))
+            if part.name >= today or len(files) < _COMPACT_MIN_FILES:
+                continue
+            table = pa.concat_tables(
+                [pq.read_table(f, schema=_schema()) for f in files]
+            )
+            merged = part / f"part-compact-{uuid.uuid4().hex[:8]}.parquet"
+            _write_atomic(table, merged)
+            for f in files:
+                f.unlink()
+            logger.info("归档分区 %s 合并 %d 个文件", part.name, len(files))
+
+    # ── 查询 ────────────────────────────────────────────────
+
+    def query(
+        self,
+        metrics: Sequence[str],
+        agg: str = "mean",
+        group_by: Optional[str] = None,
+        bin_width: Optional[float] = None,
+        calc_type: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        ranges: Sequence[Tuple[str, Optional[float], Optional[float]]] = (),
+    ) -> Dict[str, Any]:
+        """过滤后分组聚合；参数非法时抛出 ValueError"""
+        if agg not in AGGREGATES:
+            raise ValueError(f"不支持的聚合: {agg}（可选 {', '.join(AGGREGATES)}）")
+        for m in metrics:
+            if m not in NUMERIC_COLUMNS:
+                raise ValueError(f"未知的数值列: {m}")
+        if group_by and group_by not in NUMERIC_COLUMNS and group_by not in STRING_COLUMNS:
+            raise ValueError(f"未知的分组列: {group_by}")
+        if bin_width is not None and (group_by not in NUMERIC_COLUMNS or bin_width <= 0):
+            raise ValueError("bin 仅适用于数值分组列且须为正数")
+        for col, _, _ in ranges:
+            if col not in NUMERIC_COLUMNS:
+                raise ValueError(f"未知的过滤列: {col}")
+
+        # 只读取需要的列，并利用日期分区裁剪文件
+        columns = sorted({*metrics, *(c for c, _, _ in ranges), "calc_type"}
+                         | ({group_by} if group_by else set()))
+        expr = None
+
+        def _and(e):
+            nonlocal expr
+            expr = e if expr is None else expr & e
+
+        if calc_type:
+            _and(ds.field("calc_type") == calc_type)
+        for col, lo, hi in ranges:
+            if lo is not None:
+                _and(ds.field(col) >= lo)
+            if hi is not None:
+                _and(ds.field(col) <= hi)
+
+        date_expr = None
+        if date_from:
+            date_expr = ds.field("date") >= date_from.isoformat()
+        if date_to:
+            e = ds.field("date") <= date_to.isoformat()
+            date_expr = e if date_expr is None else date_expr & e
+
+        tables = []
+        if settings.archive_dir.exists() and any(settings.archive_dir.glob("date=*/*.parquet")):
+            dataset = ds.dataset(
+                settings.archive_dir,
+                format="parquet",
+                partitioning=ds.partitioning(
+                    pa.schema([("date", pa.string())]), flavor="hive"
+                ),
+                schema=_schema().append(pa.field("date", pa.string())),
+            )
+            full = expr if date_expr is None else (
+                date_expr if expr is None else expr & date_expr
+            )
+            tables.append(dataset.to_table(columns=columns, filter=full))
+
+        pending = self._buffered(date_from, date_to)
+        if pending is not None:
+            if expr is not None:
+                pending = pending.filter(expr)
+            tables.append(pending.select(columns))
+
+        if not tables:
+            return {"rows": [], "matched": 0}
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+        key = group_by
+        if group_by and bin_width:
+            key = f"{group_by}_band"
+            band = pc.multiply(
+                pc.floor(pc.divide(table[group_by], bin_width)), bin_width
+            )
+            table = table.append_column(key, band)
+
+        aggs = [(m, agg) for m in metrics] + [(metrics[0], "count")]
+        grouped = table.group_by([key] if key else []).aggregate(aggs)
+        if key:
+            grouped = grouped.sort_by(key)
+
+        rows = []
+        for rec in grouped.to_pylist():
+            row: Dict[str, Any] = {}
+            if key:
+                row[key] = rec[key]
+            for m in metrics:
+                v = rec[f"{m}_{agg}"]
+                row[f"{m}_{agg}"] = None if v is None or (
+                    isinstance(v, float) and math.isnan(v)
+                ) else v
+            row["count"] = rec[f"{metrics[0]}_count"]
+            rows.append(row)
+        return {"rows": rows, "matched": table.num_rows}
+
+    def _buffered(
+        self, date_from: Optional[date], date_to: Optional[date]
+    ) -> Optional["pa.Table"]:
+        rows = [
+            r for r in self._buffer
+            if (not date_from or r["created_at"].date() >= date_from)
+            and (not date_to or r["created_at"].date() <= date_to)
+        ]
+        if not rows:
+            return None
+        return pa.Table.from_pylist(rows, schema=_schema())
+
+
+# 全局单例
+result_archive = ResultArchive()
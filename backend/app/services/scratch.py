@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""任务运行目录：可选的 RAM 临时区（tmpfs / RAM 盘）与运行后归整
+
+启用 scratch.dir 时，.equi/.mac 输入与 EquiSage 输出都写在内存盘上；
+计算结束后只把解析结果 result.json（以及按配置保留的原始文件压缩包
+raw.zip）写回 work_root/<job_id>/，随后删除临时目录。失败的任务总是
+保留 raw.zip，便于排查。
+"""
+from __future__ import annotations
+
+import logging
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import settings
+from ..models import CalculationResult
+
+logger = logging.getLogger(__name__)
+
+
+def job_run_dir(job_id: str) -> Path:
+    """本次运行使用的目录：启用临时区时位于内存盘，否则在 work_root 下"""
+    root = settings.scratch_dir or settings.work_root
+    return root / job_id
+
+
+def discard_run_dir(job_id: str) -> None:
+    """清理临时区中的残留目录：渲染阶段即失败，或任务在运行中被取消时调用"""
+    if settings.scratch_dir is not None:
+        shutil.rmtree(settings.scratch_dir / job_id, ignore_errors=True)
+
+
+def finalize_job_dir(
+    job_id: str, paths: Dict[str, Any], result: Optional[CalculationResult]
+) -> None:
+    """运行结束后持久化需要保留的内容；仅在使用临时区时生效"""
+    run_dir: Path = paths["job_dir"]
+    if not paths.get("scratch"):
+        return
+
+    keep_dir = settings.work_root / job_id
+    keep_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        if result is not None:
+            (keep_dir / "result.json").write_text(
+                result.model_dump_json(indent=2), encoding="utf-8"
+            )
+        if result is None or settings.scratch_keep_raw:
+            _zip_dir(run_dir, keep_dir / "raw.zip")
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def _zip_dir(src: Path, dst: Path) -> None:
+    tmp = dst.with_suffix(".tmp")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for f in sorted(src.rglob("*")):
+            if f.is_file():
+                zf.write(f, f.relative_to(src).as_posix())
+    tmp.replace(dst)
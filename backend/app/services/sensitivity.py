@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""有限差分灵敏度：∂(结果)/∂(输入) 与弹性系数
+
+每个变量同时以步长 h 与 h/2 求差商，Richardson 外推得到导数估计，
+两者相对偏差超过 tolerance 时步长减半再算一轮（最多 max_refinements
+次，已算过的点由研究缓存复用）。每一轮所有变量的扰动点一次性提交，
+由本机槽位与远程 agent 并行执行。
+
+基准值减去步长会越过下界（≤0）的变量改用前向差分。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from ..models import JobRequest, JobStatus, SensitivityRequest
+from .columns import (
+    NUMERIC_INPUT_COLUMNS,
+    RESULT_COLUMNS,
+    flatten_request,
+    flatten_result,
+    request_from_row,
+)
+from .studies import Study
+
+# 允许取负值的输入列（其余列均要求 ≥0 或 >0）
+_SIGNED_COLUMNS = {"T_C"}
+_TINY = 1e-12
+
+
+def _perturbed(base_row: Dict[str, Any], var: str, value: float) -> JobRequest:
+    row = dict(base_row)
+    row[var] = value
+    try:
+        return request_from_row(row)
+    except ValidationError as exc:
+        msg = "; ".join(e["msg"] for e in exc.errors())
+        raise ValueError(f"{var}={value:g} 超出输入允许范围: {msg}") from None
+
+
+def plan_steps(body: SensitivityRequest) -> Dict[str, Tuple[float, float, str]]:
+    """校验参数并确定各变量的 (基准值, 初始步长, 差分格式)；非法时抛出 ValueError"""
+    for var in body.variables:
+        if var not in NUMERIC_INPUT_COLUMNS:
+            raise ValueError(f"未知的输入列: {var}")
+    for out in body.outputs:
+        if out not in RESULT_COLUMNS:
+            raise ValueError(f"未知的结果列: {out}")
+    for var, h in body.steps.items():
+        if var not in body.variables or h <= 0:
+            raise ValueError(f"步长设置无效: {var}={h}")
+
+    base_row = flatten_request(body.base)
+    plan = {}
+    for var in dict.fromkeys(body.variables):
+        x0 = float(base_row[var])
+        h = body.steps.get(var) or body.rel_step * abs(x0)
+        if h <= 0:
+            raise ValueError(f"{var} 基准值为 0，需在 steps 中给出绝对步长")
+        scheme = "central" if var in _SIGNED_COLUMNS or x0 - h > 0 else "forward"
+        plan[var] = (x0, h, scheme)
+    return plan
+
+
+def _offsets(scheme: str, h: float) -> List[float]:
+    return [h, -h] if scheme == "central" else [h]
+
+
+def _difference(scheme: str, f0: float, f: Dict[float, float], h: float) -> float:
+    if scheme == "central":
+        return (f[h] - f[-h]) / (2 * h)
+    return (f[h] - f0) / h
+
+
+async def run_sensitivity(study: Study, body: SensitivityRequest) -> Dict[str, Any]:
+    plan = plan_steps(body)
+    base_row = flatten_request(body.base)
+    # 变量 → 当前 (h, 迭代次数)；完成后移出 active
+    active = {var: (h, 0) for var, (_, h, _) in plan.items()}
+    values: Dict[str, Dict[float, Dict[str, float]]] = {var: {} for var in plan}
+    report: Dict[str, Dict[str, Any]] = {}
+    f0: Dict[str, float] = {}
+
+    while active:
+        # 本轮所需的全部点：基准（首轮）+ 各变量 h、h/2 上的扰动点
+        batch: List[Tuple[str, float, JobRequest]] = []
+        if not f0:
+            batch.append(("", 0.0, body.base))
+        for var, (h, _) in active.items():
+            x0, _, scheme = plan[var]
+            for step in (h, h / 2):
+                for off in _offsets(scheme, step):
+                    if off not in values[var]:
+                        batch.append((var, off, _perturbed(base_row, var, x0 + off)))
+
+        jobs = await study.evaluate([req for _, _, req in batch])
+        for (var, off, _), job in zip(batch, jobs):
+            if job.status != JobStatus.completed:
+                where = f"{var}{off:+g}" if var else "基准点"
+                raise RuntimeError(f"计算点失败（{where}）: {job.error}")
+            flat = flatten_result(job.result)
+            out = {o: float(flat[o]) for o in body.outputs}
+            if var:
+                values[var][off] = out
+            else:
+                f0 = out
+
+        for var, (h, level) in list(active.items()):
+            x0, _, scheme = plan[var]
+            coarse, fine, errors = {}, {}, {}
+            for o in body.outputs:
+                f = {off: v[o] for off, v in values[var].items()}
+                coarse[o] = _difference(scheme, f0[o], f, h)
+                fine[o] = _difference(scheme, f0[o], f, h / 2)
+                errors[o] = abs(fine[o] - coarse[o])
+            converged = all(
+                errors[o] <= body.tolerance * max(abs(fine[o]), _TINY) for o in body.outputs
+            )
+            if converged or level >= body.max_refinements:
+                order = 3.0 if scheme == "central" else 1.0
+                report[var] = {
+                    "x0": x0,
+                    "h": h / 2,
+                    "scheme": scheme,
+                    "refinements": level,
+                    "converged": converged,
+                    "derivative": {
+                        o: fine[o] + (fine[o] - coarse[o]) / order for o in body.outputs
+                    },
+                    "error": errors,
+                }
+                del active[var]
+            else:
+                active[var] = (h / 2, level + 1)
+
+    jacobian = {o: {v: report[v]["derivative"][o] for v in plan} for o in body.outputs}
+    elasticity = {
+        o: {
+            v: (jacobian[o][v] * plan[v][0] / f0[o]) if abs(f0[o]) > _TINY else None
+            for v in plan
+        }
+        for o in body.outputs
+    }
+    return {
+        "base": f0,
+        "variables": list(plan),
+        "outputs": body.outputs,
+        "jacobian": jacobian,
+        "elasticity": elasticity,
+        "steps": {
+            v: {k: r[k] for k in ("x0", "h", "scheme", "refinements", "converged", "error")}
+            for v, r in report.items()
+        },
+    }
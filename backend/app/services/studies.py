@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""研究任务：由多次计算组合而成的分析（灵敏度、优化等）
+
+每个研究在后台协程中运行，把所需的计算点成批提交给 job_manager
+并行执行；同一请求（按内容指纹）已有成功或进行中的任务时直接复用，
+不重复调用 FactSage。研究提交的任务归入以 study_id 命名的任务组，
+可通过 /api/groups/{study_id} 查看逐点进度；这些任务标记为 source=study，
+不写入结果归档，避免扰动点混入炉次统计。
+
+研究状态写入 jobs.db（studies 表），多 API 进程部署时任一进程都能查询。
+研究在发起它的 API 进程内存中运行：该进程定期刷新其未结束研究的心跳，
+并把心跳超时（所属进程已退出）的研究标记为失败，启动时也检查一次。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..models import JobRequest, JobStatus
+from .idempotency import request_fingerprint
+from .job_manager import job_manager
+from .job_store import SOURCE_STUDY, JobRecord, job_store
+
+logger = logging.getLogger(__name__)
+
+# 缓存上限：超过后淘汰最早加入的计算点
+_MAX_CACHED_POINTS = 20000
+# 内存中保留的已结束研究数；更早的从 jobs.db 读取
+_MAX_FINISHED_STUDIES = 200
+# 未结束研究的心跳间隔；超过 _STALE_SECONDS 未刷新视为所属进程已退出
+_HEARTBEAT_SECONDS = 15.0
+_STALE_SECONDS = 4 * _HEARTBEAT_SECONDS
+
+
+class Study:
+    """单个研究的运行上下文，供分析函数提交计算点"""
+
+    def __init__(self, manager: "StudyManager", study_id: str, kind: str) -> None:
+        self._manager = manager
+        self.study_id = study_id
+        self.kind = kind
+        self.status = JobStatus.pending
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.evaluations = 0
+        self.reused = 0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def evaluate(self, requests: List[JobRequest]) -> List[JobRecord]:
+        """并行评估一批请求，返回对应的终态任务记录（顺序与输入一致）"""
+        job_ids = []
+        for req in requests:
+            job_id, reused = await self._manager.point(req, self.study_id)
+            job_ids.append(job_id)
+            if reused:
+                self.reused += 1
+            else:
+                self.evaluations += 1
+        self._manager.persist(self)
+        return list(await asyncio.gather(*(job_manager.wait(j) for j in job_ids)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "study_id": self.study_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "evaluations": self.evaluations,
+            "reused": self.reused,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class StudyManager:
+    def __init__(self) -> None:
+        self._studies: Dict[str, Study] = {}
+        # 请求指纹 → job_id（插入有序，用于淘汰）
+        self._points: Dict[str, str] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def point(self, request: JobRequest, group_id: str):
+        """取得请求对应的任务：可复用时返回 (已有 job_id, True)，否则提交新任务"""
+        fp = request_fingerprint(request)
+        job_id = self._points.get(fp)
+        if job_id:
+            job = job_manager.get(job_id)
+            if job and job.status != JobStatus.failed:
+                return job_id, True
+        job_id = await job_manager.submit(
+            request, group_id=group_id, source=SOURCE_STUDY
+        )
+        self._points.pop(fp, None)
+        self._points[fp] = job_id
+        while len(self._points) > _MAX_CACHED_POINTS:
+            del self._points[next(iter(self._points))]
+        return job_id, False
+
+    def create(
+        self, kind: str, run: Callable[[Study], Awaitable[Dict[str, Any]]]
+    ) -> Study:
+        """登记并在后台启动一个研究，run(study) 返回结果字典"""
+        study = Study(self, uuid.uuid4().hex, kind)
+        self._studies[study.study_id] = study
+        self.persist(study)
+        study.task = asyncio.create_task(self._run(study, run))
+        return study
+
+    def get(self, study_id: str) -> Optional[Dict[str, Any]]:
+        """研究状态（本进程运行中的直接返回，否则从库中读取）"""
+        study = self._studies.get(study_id)
+        if study is not None:
+            return study.to_dict()
+        return job_store.load_study(study_id)
+
+    def persist(self, study: Study) -> None:
+        try:
+            job_store.save_study({**study.to_dict(), "heartbeat": time.time()})
+        except Exception:
+            logger.error("研究 %s 状态持久化失败", study.study_id, exc_info=True)
+
+    def start(self) -> None:
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self) -> None:
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        tasks = [s.task for s in self._studies.values() if s.task and not s.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(
+        self, study: Study, run: Callable[[Study], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        study.status = JobStatus.running
+        logger.info("研究 %s (%s) 开始", study.study_id, study.kind)
+        try:
+            study.result = await run(study)
+            study.status = JobStatus.completed
+            logger.info(
+                "研究 %s 完成: 计算 %d 次, 复用 %d 次",
+                study.study_id, study.evaluations, study.reused,
+            )
+        except asyncio.CancelledError:
+            study.status = JobStatus.failed
+            study.error = "服务停止，研究已取消"
+            self.persist(study)
+            raise
+        except Exception as exc:
+            study.status = JobStatus.failed
+            study.error = str(exc)
+            logger.error("研究 %s 失败: %s", study.study_id, exc, exc_info=True)
+        self.persist(study)
+        self._trim()
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                orphaned = await asyncio.to_thread(
+                    job_store.fail_stale_studies, time.time() - _STALE_SECONDS
+                )
+                if orphaned:
+                    logger.warning("%d 个研究所在进程已退出，已标记为失败", orphaned)
+            except Exception:
+                logger.error("研究心跳检查失败", exc_info=True)
+            await asyncio.sleep(_HEARTBEAT_SECONDS)
+            for study in list(self._studies.values()):
+                if study.task and not study.task.done():
+                    self.persist(study)
+
+    def _trim(self) -> None:
+        """只在内存中保留最近结束的研究，运行中的始终保留"""
+        finished = [
+            sid for sid, s in self._studies.items()
+            if s.status in (JobStatus.completed, JobStatus.failed)
+        ]
+        for sid in finished[: max(0, len(finished) - _MAX_FINISHED_STUDIES)]:
+            del self._studies[sid]
+
+
+# 全局单例
+study_manager = StudyManager()
@@ -9,6 +9,7 @@ from jinja2 import Template
 
 from ..config import settings
 from ..models import JobRequest
+from .scratch import job_run_dir
 
 
 def _read_text(path: Path) -> str:
@@ -30,7 +31,7 @@ def _write_text(path: Path, text: str) -> None:
 
 def render_job_templates(job_id: str, request: JobRequest) -> Dict[str, Any]:
     """渲染 .equi 和 .mac 模板，返回各路径信息"""
-    job_dir = settings.work_root / job_id
+    job_dir = job_run_dir(job_id)
     in_dir = job_dir / "input"
     out_dir = job_dir / "out"
     in_dir.mkdir(parents=True, exist_ok=True)
@@ -78,4 +79,5 @@ def render_job_templates(job_id: str, request: JobRequest) -> Dict[str, Any]:
         "equi_path": equi_path,
         "mac_path": mac_path,
         "prefix": prefix,
+        "scratch": settings.scratch_dir is not None,
     }
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""基准用例：模板渲染 / XML 解析 / 任务队列 / HTTP 接口
+
+每个用例返回 {指标名: {"value", "unit", "better"}}，better 取 higher / lower。
+"""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from .fixtures import SAMPLE_REQUEST, sample_xmls
+
+Metrics = Dict[str, Dict]
+
+
+def _metric(value: float, unit: str, better: str) -> Dict:
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _timed(fn: Callable[[], None], iterations: int) -> List[float]:
+    """执行 iterations 次，返回每次耗时 (s)"""
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _throughput(prefix: str, samples: List[float]) -> Metrics:
+    total = sum(samples) or 1e-12
+    return {
+        f"{prefix}.ops_per_s": _metric(len(samples) / total, "ops/s", "higher"),
+        f"{prefix}.p50_ms": _metric(percentile(samples, 50) * 1e3, "ms", "lower"),
+        f"{prefix}.p95_ms": _metric(percentile(samples, 95) * 1e3, "ms", "lower"),
+    }
+
+
+# ── 模板渲染 ──────────────────────────────────────────────
+
+
+def bench_render(iterations: int) -> Metrics:
+    from app.models import JobRequest
+    from app.services.template_renderer import render_job_templates
+
+    request = JobRequest(**SAMPLE_REQUEST)
+    counter = iter(range(iterations))
+    samples = _timed(
+        lambda: render_job_templates(f"render{next(counter):06d}", request),
+        iterations,
+    )
+    return _throughput("render", samples)
+
+
+# ── XML 解析 ──────────────────────────────────────────────
+
+
+def bench_parse(iterations: int) -> Metrics:
+    from app.services.result_parser import parse_result_xml
+
+    xmls = sample_xmls()
+    if not xmls:
+        return {}
+    metrics: Metrics = {}
+    for xml in xmls:
+        samples = _timed(lambda: parse_result_xml(xml), iterations)
+        metrics.update(_throughput(f"parse.{xml.stem}", samples))
+    return metrics
+
+
+# ── 任务队列 ──────────────────────────────────────────────
+
+
+async def _drain_queue(jobs: int) -> float:
+    from app.models import JobRequest
+    from app.services.job_manager import JobManager
+
+    manager = JobManager()
+    request = JobRequest(**SAMPLE_REQUEST)
+    await manager.start()
+    t0 = time.perf_counter()
+    try:
+        job_ids = [await manager.submit(request) for _ in range(jobs)]
+        await manager._queue.join()
+        elapsed = time.perf_counter() - t0
+    finally:
+        await manager.stop()
+    # 只检查本轮提交的任务：jobs.db 中还有其他用例（及前几轮）留下的记录
+    failed = [j for j in map(manager.get, job_ids) if j.error]
+    if failed:
+        raise RuntimeError(f"队列基准中 {len(failed)} 个任务失败: {failed[0].error}")
+    return elapsed
+
+
+def bench_queue(jobs: int) -> Metrics:
+    """mock 执行器与替身执行器（解析样例 XML，模拟真实路径的后处理开销）"""
+    from app.services import job_manager as jm_module
+    from app.services.result_parser import parse_result_xml
+
+    metrics: Metrics = {}
+    elapsed = asyncio.run(_drain_queue(jobs))
+    metrics["queue.mock.jobs_per_s"] = _metric(jobs / elapsed, "jobs/s", "higher")
+
+    xmls = sample_xmls()
+    if xmls:
+        async def standin(job_id, request, paths):
+            return parse_result_xml(xmls[0])
+
+        original = jm_module.run_calculation
+        jm_module.run_calculation = standin
+        try:
+            elapsed = asyncio.run(_drain_queue(jobs))
+        finally:
+            jm_module.run_calculation = original
+        metrics["queue.standin.jobs_per_s"] = _metric(
+            jobs / elapsed, "jobs/s", "higher"
+        )
+    return metrics
+
+
+# ── HTTP 接口 ─────────────────────────────────────────────
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Server:
+    """在后台线程中运行 uvicorn，退出时优雅关闭"""
+
+    def __init__(self) -> None:
+        import uvicorn
+
+        from app.main import app
+
+        self.port = _free_port()
+        config = uvicorn.Config(
+            app, host="127.0.0.1", port=self.port, log_level="warning"
+        )
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "_Server":
+        self.thread.start()
+        deadline = time.monotonic() + 15
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn 启动超时")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=15)
+
+
+def _client_loop(
+    port: int, method: str, path: str, body: bytes | None, n: int
+) -> List[float]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"} if body else {}
+    samples = []
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            samples.append(time.perf_counter() - t0)
+            if resp.status >= 400:
+                raise RuntimeError(f"{method} {path} -> HTTP {resp.status}")
+    finally:
+        conn.close()
+    return samples
+
+
+def _load(
+    port: int, method: str, path: str, body: bytes | None,
+    clients: int, per_client: int,
+) -> Metrics:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        futures = [
+            pool.submit(_client_loop, port, method, path, body, per_client)
+            for _ in range(clients)
+        ]
+        samples = [s for f in futures for s in f.result()]
+    wall = time.perf_counter() - t0
+    name = f"http.{method.lower()}_{path.strip('/').replace('/', '_')}"
+    return {
+        f"{name}.rps": _metric(len(samples) / wall, "req/s", "higher"),
+        f"{name}.p50_ms": _metric(percentile(samples, 50) * 1e3, "ms", "lower"),
+        f"{name}.p95_ms": _metric(percentile(samples, 95) * 1e3, "ms", "lower"),
+        f"{name}.p99_ms": _metric(percentile(samples, 99) * 1e3, "ms", "lower"),
+        f"{name}.mean_ms": _metric(statistics.fmean(samples) * 1e3, "ms", "lower"),
+    }
+
+
+def bench_http(clients: int, per_client: int) -> Metrics:
+    body = json.dumps(SAMPLE_REQUEST).encode("utf-8")
+    metrics: Metrics = {}
+    with _Server() as srv:
+        metrics.update(_load(srv.port, "GET", "/api/presets", None, clients, per_client))
+        metrics.update(_load(srv.port, "POST", "/api/calculate", body, clients, per_client))
+        # 列表接口放在提交之后，使其在真实规模的任务表上度量
+        metrics.update(_load(srv.port, "GET", "/api/jobs", None, clients, per_client))
+    return metrics
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""基准测试夹具：隔离的工作目录 / 替身模板 / 预设 / 样例 XML"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_WORK = BACKEND_DIR / "work"
+
+# 与前端默认脱氧预设一致的请求体
+SAMPLE_REQUEST: Dict = {
+    "calc_type": "deoxidation",
+    "steel": {
+        "Fe_g": 98.437, "Mn_field": "1", "Si_g": 0.5,
+        "Al_g": 0.05, "O_g": 0.003, "S_g": 0.01,
+    },
+    "slag": {"CaO_g": 4.0, "Al2O3_g": 4.0, "SiO2_g": 2.0},
+    "conditions": {"T_C": 1600.0, "P_atm": 1.0},
+    "target": {"element": "Al", "value": 0.03},
+    "alpha_guess": 0.5,
+}
+
+# 样例 .equi 中需替换为模板变量的行（按行首匹配）
+_EQUI_PLACEHOLDERS = {
+    "'ESTA'": "'ESTA' '{{ alpha_guess }}' '' '0'",
+    " 98.437 Fe": " {{ Fe_g }} Fe  +  {{ Mn_field }} Mn  +  {{ Si_g }} Si  +  {{ Al_g }} Al  +",
+    " 0.003 O": " {{ O_g }} O  +  {{ S_g }} S  +  {{ CaO_g }} CaO  +  {{ Al2O3_g }} Al2O3  +",
+    " 2.0 SiO2": " {{ SiO2_g }} SiO2  +  <A> Ca  =",
+    " 'T' ": " 'T' '{{ T_C }}' 'P' '{{ P_atm }}' 'DH' ''",
+}
+
+_MAC_TEMPLATE = """\
+VARIABLE %EquiFile %OutDir %Prefix %TempC %PressAtm
+
+%EquiFile = "{{ equi_file }}"
+%OutDir   = "{{ out_dir }}"
+%Prefix   = "{{ prefix }}"
+
+%TempC    = {{ T_C }}
+%PressAtm = {{ P_atm }}
+
+OPEN %EquiFile
+SET FINAL T %TempC
+SET FINAL P %PressAtm
+
+CALC
+
+SAVE "%OutDir%Prefix.xml"
+SAVE "%OutDir%Prefix.res"
+
+END
+"""
+
+
+_POPULATED: List[Path] = []
+
+
+def sample_xmls() -> List[Path]:
+    """可成功解析的 EquiSage 输出样例（由 prepare_environment 生成）"""
+    return list(_POPULATED)
+
+
+def _populate_xml(src: Path, dst: Path) -> None:
+    """以仓库样例为骨架填充 page 属性与 result 行
+
+    仓库自带样例来自一次未收敛的计算（alpha/T/P 全 0、result id 为空），
+    会被解析器拒绝；这里保留其全部结构与体积，只补齐数值，
+    使解析基准覆盖完整的相/物种归集路径。
+    """
+    tree = ET.parse(src)
+    root = tree.getroot()
+    page = root.find("page")
+    spec_def = root.find("header/species_definition")
+    if page is None or spec_def is None:
+        return
+    page.set("alpha", "1.234500E-001")
+    page.set("T", "1.873150E+003")
+    page.set("P", "1.000000E+000")
+    species_ids = [sp.attrib["id"] for sp in spec_def.iter("species")]
+    for i, r in enumerate(page.findall("result")):
+        if i >= len(species_ids):
+            break
+        r.set("id", species_ids[i])
+        r.set("g", f"{1.0 / (i + 1):.6E}")
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tree.write(dst, encoding="utf-8", xml_declaration=True)
+
+
+def _write_standin_templates(dst: Path) -> None:
+    """以样例输入为蓝本生成替身模板（仅用于度量渲染开销）"""
+    samples = sorted(SAMPLE_WORK.glob("*/input/case.equi"))
+    lines = samples[0].read_text(encoding="utf-8").splitlines() if samples else []
+    for i, line in enumerate(lines):
+        for head, tpl in _EQUI_PLACEHOLDERS.items():
+            if line.startswith(head):
+                lines[i] = tpl
+                break
+    dst.mkdir(parents=True, exist_ok=True)
+    (dst / "ca_equilib_estimate.equi.j2").write_text(
+        "\n".join(lines) + "\n", encoding="utf-8"
+    )
+    (dst / "run_equilib.mac.j2").write_text(_MAC_TEMPLATE, encoding="utf-8")
+
+
+def prepare_environment(templates_dir: str | None = None) -> Path:
+    """创建隔离的临时目录并通过环境变量指向它（须在导入 app 之前调用）
+
+    未指定模板目录时使用替身模板；强制 mock 模式且无延迟，
+    使度量结果只反映本程序自身的开销。结果归档同样写入临时目录，
+    不污染正式归档。
+    """
+    root = Path(tempfile.mkdtemp(prefix="fsca-bench-"))
+
+    if templates_dir is None:
+        tpl = root / "templates"
+        _write_standin_templates(tpl)
+        templates_dir = str(tpl)
+
+    _POPULATED.clear()
+    for src in sorted(SAMPLE_WORK.glob("*/out/result.xml")):
+        dst = root / "xml" / f"{src.parent.parent.name}.xml"
+        _populate_xml(src, dst)
+        if dst.exists():
+            _POPULATED.append(dst)
+
+    presets = root / "presets"
+    presets.mkdir()
+    deox = dict(SAMPLE_REQUEST, job_id="example_deoxidation")
+    desulf = dict(
+        SAMPLE_REQUEST,
+        job_id="example_desulfurization",
+        calc_type="desulfurization",
+        target={"element": "S", "value": 0.002},
+    )
+    for data in (deox, desulf):
+        (presets / f"{data['job_id']}.json").write_text(
+            json.dumps(data, ensure_ascii=False), encoding="utf-8"
+        )
+
+    os.environ.update(
+        WORK_ROOT=str(root / "work"),
+        ARCHIVE_DIR=str(root / "archive"),
+        TEMPLATES_DIR=templates_dir,
+        PRESETS_DIR=str(presets),
+        MOCK_MODE="true",
+        MOCK_DELAY="0",
+    )
+    return root
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""录制流量重放：按原始到达间隔（可加速）重新提交 /api/calculate
+
+用法（在 backend/ 目录下）::
+
+    python -m benchmarks.replay http://127.0.0.1:10687                 # 1× 原速
+    python -m benchmarks.replay http://127.0.0.1:10687 --speed 100 --out replay.json
+    python -m benchmarks.replay http://host:10687 --files D:/rec --limit 500
+
+录制文件由 recording.enabled 开启后写入 recording.dir（默认
+work/_recordings）下的 calculate*.jsonl*；多个 API 进程各写一个文件，
+重放时合并后按到达时间排序。
+请求按计划时间开环发送（不等待此前的任务完成），已提交的任务由独立
+线程轮询 /api/jobs/{id} 至终态，统计服务端排队时间 (queue_seconds)、
+执行时间 (run_seconds)、客户端端到端延迟与吞吐。端到端延迟的分辨率
+受 --poll 间隔限制。
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+from .cases import percentile
+
+_TERMINAL = ("completed", "failed")
+
+
+def _recording_files(paths: List[Path]) -> List[Path]:
+    """目录展开为 calculate.jsonl*，按滚动序号从旧到新排列"""
+    files: List[Path] = []
+    for p in paths:
+        if p.is_dir():
+            found = list(p.glob("*.jsonl*"))
+
+            def _age(f: Path) -> int:
+                suffix = f.name.rsplit(".", 1)[-1]
+                return int(suffix) if suffix.isdigit() else 0
+
+            files.extend(sorted(found, key=_age, reverse=True))
+        elif p.exists():
+            files.append(p)
+    return files
+
+
+def load_recording(paths: List[Path]) -> List[Tuple[float, Any]]:
+    """读取 (到达时间, 请求体)，按时间排序；损坏的行跳过"""
+    entries = []
+    for f in _recording_files(paths):
+        with open(f, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                    entries.append((float(rec["ts"]), rec["body"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    entries.sort(key=lambda e: e[0])
+    return entries
+
+
+class _Http:
+    """每个线程一条 keep-alive 连接"""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        u = urllib.parse.urlsplit(base_url)
+        self._cls = (
+            http.client.HTTPSConnection if u.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._netloc = u.netloc
+        self._prefix = u.path.rstrip("/")
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None):
+        for attempt in (0, 1):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = self._cls(self._netloc, timeout=self._timeout)
+            try:
+                headers = {"Content-Type": "application/json"} if body else {}
+                conn.request(method, self._prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, ConnectionError):
+                # 服务端关闭了空闲连接：重连一次
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def _send(
+    client: _Http, index: int, body: Any, due: float, results: List[Dict[str, Any]],
+    inflight: Dict[int, str], lock: threading.Lock,
+) -> None:
+    """提交一个请求；成功后交给轮询线程跟踪"""
+    sent = time.perf_counter()
+    out = results[index]
+    out["lateness"] = max(0.0, sent - due)
+    out["sent"] = sent
+    try:
+        status, data = client.request(
+            "POST", "/api/calculate", json.dumps(body).encode("utf-8")
+        )
+        if status >= 400:
+            out["outcome"] = f"http_{status}"
+            return
+        job_id = json.loads(data)["job_id"]
+    except (OSError, http.client.HTTPException, ValueError, KeyError) as exc:
+        out["outcome"] = f"error: {exc}"
+        return
+    with lock:
+        inflight[index] = job_id
+
+
+def _poll_one(
+    client: _Http, index: int, job_id: str, results: List[Dict[str, Any]],
+    job_timeout: float,
+) -> bool:
+    """查询一次任务状态；进入终态或超时返回 True"""
+    out = results[index]
+    try:
+        _, data = client.request("GET", f"/api/jobs/{job_id}")
+        job = json.loads(data)
+    except (OSError, http.client.HTTPException, ValueError) as exc:
+        out["outcome"] = f"error: {exc}"
+        return True
+    now = time.perf_counter()
+    if job.get("status") in _TERMINAL:
+        out.update(
+            outcome=job["status"],
+            done=now,
+            e2e=now - out["sent"],
+            queue=job.get("queue_seconds"),
+            run=job.get("run_seconds"),
+        )
+        return True
+    if now - out["sent"] > job_timeout:
+        out["outcome"] = "timeout"
+        return True
+    return False
+
+
+def _dist(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(samples, 50), 3),
+        "p90": round(percentile(samples, 90), 3),
+        "p99": round(percentile(samples, 99), 3),
+        "max": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def replay(
+    base_url: str,
+    entries: List[Tuple[float, Any]],
+    speed: float = 1.0,
+    clients: int = 64,
+    poll: float = 0.25,
+    job_timeout: float = 600.0,
+) -> Dict[str, Any]:
+    """开环重放：按计划时间发送，不等待先前任务完成
+
+    主线程只负责按时把请求交给发送线程池；已提交的任务由独立的轮询
+    线程每 poll 秒批量查询一次，因此服务端变慢时提交节奏不受影响，
+    排队时间如实反映在 queue_seconds 中。
+    """
+    client = _Http(base_url, timeout=30)
+    results: List[Dict[str, Any]] = [{} for _ in entries]
+    inflight: Dict[int, str] = {}
+    lock = threading.Lock()
+    sending_done = threading.Event()
+
+    def _poller() -> None:
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            while True:
+                finished_sending = sending_done.is_set()
+                with lock:
+                    batch = list(inflight.items())
+                if not batch and finished_sending:
+                    return
+                finished = list(pool.map(
+                    lambda item: _poll_one(client, *item, results, job_timeout), batch
+                ))
+                with lock:
+                    for (index, _), done in zip(batch, finished):
+                        if done:
+                            del inflight[index]
+                time.sleep(poll)
+
+    poller = threading.Thread(target=_poller, name="replay-poller", daemon=True)
+    poller.start()
+    t0 = entries[0][0]
+    start = time.perf_counter() + 0.5
+    with ThreadPoolExecutor(max_workers=clients) as senders:
+        for index, (ts, body) in enumerate(entries):
+            due = start + (ts - t0) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            senders.submit(_send, client, index, body, due, results, inflight, lock)
+    sending_done.set()
+    poller.join()
+
+    outcomes: Dict[str, int] = {}
+    for r in results:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+    finished = [r for r in results if "done" in r]
+    completed = [r for r in finished if r["outcome"] == "completed"]
+    span = (entries[-1][0] - t0) / speed
+    wall = (
+        max(r["done"] for r in finished) - min(r["sent"] for r in finished)
+        if finished else 0.0
+    )
+    return {
+        "server": base_url,
+        "requests": len(entries),
+        "speed": speed,
+        "outcomes": outcomes,
+        "offered_rps": round(len(entries) / span, 3) if span > 0 else None,
+        "throughput_rps": round(len(completed) / wall, 3) if wall > 0 else None,
+        "queue_seconds": _dist([r["queue"] for r in finished if r["queue"] is not None]),
+        "run_seconds": _dist([r["run"] for r in finished if r["run"] is not None]),
+        "e2e_seconds": _dist([r["e2e"] for r in finished]),
+        # 客户端线程不足时提交会晚于录制节奏，lateness 可用来判断 --clients 是否够用
+        "send_lateness_seconds": _dist([r["lateness"] for r in results]),
+    }
+
+
+def _print_summary(report: Dict[str, Any]) -> None:
+    out = sys.stderr
+    print(f"重放 {report['requests']} 个请求 @ {report['speed']}×  -> {report['server']}", file=out)
+    print(f"  结果: {report['outcomes']}", file=out)
+    print(f"  提交速率 {report['offered_rps']} req/s, 完成吞吐 {report['throughput_rps']} job/s",
+          file=out)
+    for key in ("queue_seconds", "run_seconds", "e2e_seconds", "send_lateness_seconds"):
+        d = report[key]
+        print(f"  {key:<22} p50={d['p50']:<8} p90={d['p90']:<8} "
+              f"p99={d['p99']:<8} max={d['max']}", file=out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="重放录制的 /api/calculate 流量")
+    ap.add_argument("server", help="目标服务地址，如 http://127.0.0.1:10687")
+    ap.add_argument("--files", type=Path, nargs="*", default=[settings.recording_dir],
+                    help="录制文件或目录（默认 config.json 中的 recording.dir）")
+    ap.add_argument("--speed", type=float, default=1.0, help="时间加速倍数 (1 / 10 / 100 …)")
+    ap.add_argument("--limit", type=int, help="只重放前 N 个请求")
+    ap.add_argument("--clients", type=int, default=64,
+                    help="发送 / 轮询线程数（只影响单次 HTTP 请求的并发）")
+    ap.add_argument("--poll", type=float, default=0.25, help="任务状态轮询间隔 (s)")
+    ap.add_argument("--job-timeout", type=float, default=600, help="单任务最长等待 (s)")
+    ap.add_argument("--out", type=Path, help="结果 JSON 输出路径（默认 stdout）")
+    args = ap.parse_args(argv)
+    if args.speed <= 0:
+        ap.error("--speed 须为正数")
+
+    entries = load_recording(args.files)[: args.limit]
+    if not entries:
+        print("没有可重放的录制记录", file=sys.stderr)
+        return 1
+    report = replay(
+        args.server, entries, args.speed, args.clients, args.poll, args.job_timeout
+    )
+    _print_summary(report)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""性能基准入口：输出 JSON 结果并与基线对比
+
+用法（在 backend/ 目录下）::
+
+    python -m benchmarks.run                       # 运行并与 benchmarks/baseline.json 对比
+    python -m benchmarks.run --save-baseline       # 将本次结果保存为新基线
+    python -m benchmarks.run --only render,parse --out bench.json --no-compare
+    python -m benchmarks.run --quick --repeat 5 --save-baseline   # 生成仓库内的基线
+
+存在超出容差的退化时以退出码 1 结束，便于在部署前拦截；要求对比但基线
+文件不存在时以退出码 2 结束。--repeat N 时每个指标取 N 次运行的中位数，
+降低偶发抖动造成的误报。仓库内的 baseline.json 由上面最后一条命令生成；
+基线与本机硬件相关，换机器后应重新 --save-baseline。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from .fixtures import prepare_environment
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+SUITES = ("render", "parse", "queue", "http")
+
+
+def _parse_args(argv: List[str] | None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="FactSage Ca App 性能基准")
+    ap.add_argument("--only", default=",".join(SUITES),
+                    help=f"逗号分隔的用例子集 ({','.join(SUITES)})")
+    ap.add_argument("--out", type=Path, help="结果 JSON 输出路径（默认 stdout）")
+    ap.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="将本次结果写入 --baseline 路径")
+    ap.add_argument("--no-compare", action="store_true", help="只输出结果，不与基线对比")
+    ap.add_argument("--tolerance", type=float, default=0.20,
+                    help="允许的相对退化幅度（默认 0.20 = 20%%）")
+    ap.add_argument("--quick", action="store_true", help="缩减迭代次数，用于冒烟")
+    ap.add_argument("--repeat", type=int, default=1,
+                    help="整套用例重复次数，各指标取中位数（默认 1）")
+    ap.add_argument("--templates-dir", help="使用真实模板目录代替替身模板")
+    ap.add_argument("--clients", type=int, default=8, help="HTTP 并发客户端数")
+    return ap.parse_args(argv)
+
+
+def _median(runs: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """多次运行的同名指标取中位数"""
+    merged: Dict[str, Dict] = {}
+    for name, first in runs[0].items():
+        values = [r[name]["value"] for r in runs if name in r]
+        merged[name] = {**first, "value": round(statistics.median(values), 4)}
+    return merged
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> Dict:
+    """逐项与基线对比，返回 {metric: {...}} 及退化列表"""
+    items: Dict[str, Dict] = {}
+    regressions: List[str] = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base or not base.get("value"):
+            continue
+        ratio = cur["value"] / base["value"]
+        if cur["better"] == "higher":
+            regressed = ratio < 1 - tolerance
+        else:
+            regressed = ratio > 1 + tolerance
+        items[name] = {
+            "baseline": base["value"],
+            "current": cur["value"],
+            "ratio": round(ratio, 4),
+            "regressed": regressed,
+        }
+        if regressed:
+            regressions.append(name)
+    return {"tolerance": tolerance, "metrics": items, "regressions": regressions}
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _parse_args(argv)
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        print(f"未知用例: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    compare_baseline = not (args.save_baseline or args.no_compare)
+    if compare_baseline and not args.baseline.exists():
+        print(
+            f"基线文件不存在: {args.baseline}\n"
+            "先运行 --save-baseline 生成基线，或加 --no-compare 跳过对比",
+            file=sys.stderr,
+        )
+        return 2
+
+    # 必须先设置环境变量再导入 app
+    tmp_root = prepare_environment(args.templates_dir)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    from . import cases
+
+    scale = 0.1 if args.quick else 1.0
+    n = lambda base: max(5, int(base * scale))  # noqa: E731
+
+    runs: List[Dict[str, Dict]] = []
+    timings: Dict[str, float] = {}
+    try:
+        for _ in range(max(1, args.repeat)):
+            results: Dict[str, Dict] = {}
+            for suite in suites:
+                t0 = time.perf_counter()
+                if suite == "render":
+                    results.update(cases.bench_render(n(500)))
+                elif suite == "parse":
+                    results.update(cases.bench_parse(n(100)))
+                elif suite == "queue":
+                    results.update(cases.bench_queue(n(500)))
+                elif suite == "http":
+                    results.update(cases.bench_http(args.clients, n(200)))
+                elapsed = time.perf_counter() - t0
+                timings[suite] = round(timings.get(suite, 0.0) + elapsed, 3)
+                print(f"[bench] {suite:<7} 完成 ({elapsed:.1f}s)", file=sys.stderr)
+            runs.append(results)
+    finally:
+        shutil.rmtree(tmp_root, ignore_errors=True)
+    results = _median(runs)
+
+    report: Dict = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "suites": suites,
+            "quick": args.quick,
+            "repeat": len(runs),
+            "suite_seconds": timings,
+        },
+        "results": results,
+    }
+
+    if compare_baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("quick") != args.quick:
+            print("[bench] 注意: 基线与本次运行的 --quick 设置不同，迭代次数不一致",
+                  file=sys.stderr)
+        report["comparison"] = compare(
+            results, baseline.get("results", {}), args.tolerance
+        )
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        args.baseline.write_text(text, encoding="utf-8")
+        print(f"[bench] 基线已保存: {args.baseline}", file=sys.stderr)
+        return 0
+
+    regressions = report.get("comparison", {}).get("regressions", [])
+    for name in regressions:
+        m = report["comparison"]["metrics"][name]
+        print(f"[bench] 退化 {name}: {m['baseline']} -> {m['current']}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""pytest 夹具：导入 app 之前把工作目录、归档、模板与预设指向临时目录
+
+复用基准测试的 prepare_environment()（强制 mock 模式），测试不会读写
+正式的 work/ 与 archive/。在 backend/ 目录下运行 ``python -m pytest``。
+"""
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import SAMPLE_REQUEST, prepare_environment  # noqa: E402
+
+_ROOT = prepare_environment()
+
+
+def pytest_sessionfinish(session, exitstatus) -> None:
+    shutil.rmtree(_ROOT, ignore_errors=True)
+
+
+@pytest.fixture
+def sample_request():
+    from app.models import JobRequest
+
+    return JobRequest(**SAMPLE_REQUEST)
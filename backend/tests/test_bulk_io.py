@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""批量导入的逐行校验"""
+from __future__ import annotations
+
+import pytest
+
+from app.models import CalcType
+from app.services.bulk_io import parse_import
+from app.services.columns import INPUT_COLUMNS, flatten_request, request_from_row
+
+
+def _csv(rows, header=None) -> bytes:
+    header = header or ["heat_id", *INPUT_COLUMNS]
+    lines = [",".join(header)]
+    for row in rows:
+        lines.append(",".join("" if row.get(c) is None else str(row[c]) for c in header))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@pytest.fixture
+def row(sample_request):
+    return {"heat_id": "H1", **flatten_request(sample_request)}
+
+
+def test_valid_rows_are_accepted_with_labels(row, sample_request):
+    accepted, errors = parse_import(_csv([row, {**row, "heat_id": "H2"}]), "a.csv")
+    assert errors == []
+    assert [label for _, label in accepted] == ["H1", "H2"]
+    assert accepted[0][0] == sample_request
+
+
+def test_invalid_row_reports_line_number_and_field(row):
+    bad = {**row, "heat_id": "H2", "O_g": "abc"}
+    accepted, errors = parse_import(_csv([row, bad, {**row, "heat_id": "H3"}]), "a.csv")
+    assert [label for _, label in accepted] == ["H1", "H3"]
+    assert len(errors) == 1
+    # 表头为第 1 行
+    assert errors[0].row == 3
+    assert any("O_g" in e for e in errors[0].errors)
+
+
+def test_blank_lines_are_skipped_and_line_numbers_kept(row):
+    header, good, bad = _csv([row, {**row, "O_g": -1}]).decode("utf-8").splitlines()
+    data = "\n".join([header, good, ",,,", bad]).encode("utf-8")
+    accepted, errors = parse_import(data, "a.csv")
+    assert len(accepted) == 1
+    assert [e.row for e in errors] == [4]
+
+
+def test_calc_type_is_inferred_from_target_element(row):
+    for element, calc_type in (("Al", CalcType.deoxidation), ("S", CalcType.desulfurization)):
+        accepted, errors = parse_import(
+            _csv([{**row, "calc_type": None, "target_element": element}]), "a.csv"
+        )
+        assert errors == []
+        assert accepted[0][0].calc_type == calc_type
+
+
+def test_integer_float_mn_field_is_normalised(row):
+    # XLSX 单元格中的 1 读出为 1.0
+    assert request_from_row({**row, "Mn_field": 1.0}).steel.Mn_field == "1"
+    assert request_from_row({**row, "Mn_field": " 2 "}).steel.Mn_field == "2"
+
+
+def test_unknown_or_missing_columns_reject_the_file(row):
+    with pytest.raises(ValueError, match="无法识别的列"):
+        parse_import(_csv([row], header=["heat_id", "O_g", "bogus"]), "a.csv")
+    with pytest.raises(ValueError, match="表头缺少输入列"):
+        parse_import(b"foo,bar\n1,2\n", "a.csv")
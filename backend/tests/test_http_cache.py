@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""弱 ETag 与条件请求（含经压缩中间件输出时）"""
+from __future__ import annotations
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.testclient import TestClient
+
+from app.services.http_cache import (
+    REVALIDATE,
+    cached_response,
+    etag_matches,
+    make_etag,
+)
+
+BODY = b'{"value": "' + b"x" * 4096 + b'"}'
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
+    @app.get("/doc")
+    async def doc(request: Request):
+        return cached_response(BODY, make_etag(BODY), REVALIDATE, request.headers)
+
+    return TestClient(app)
+
+
+def test_etag_is_weak_and_stable():
+    etag = make_etag(BODY)
+    assert etag.startswith('W/"')
+    assert etag == make_etag(BODY)
+    assert etag != make_etag(BODY + b" ")
+
+
+def test_etag_matches_ignores_weak_prefix_on_both_sides():
+    etag = make_etag(BODY)
+    opaque = etag.removeprefix("W/")
+    assert etag_matches(etag, etag)
+    assert etag_matches(opaque, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_same_etag_for_every_encoding_and_304_on_revalidation():
+    client = _client()
+    plain = client.get("/doc", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/doc", headers={"Accept-Encoding": "gzip"})
+    assert plain.status_code == gzipped.status_code == 200
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == gzipped.headers["etag"]
+
+    etag = gzipped.headers["etag"]
+    for encoding in ("identity", "gzip"):
+        r = client.get("/doc", headers={"Accept-Encoding": encoding, "If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.headers["etag"] == etag
+        assert r.content == b""
+
+
+def test_changed_content_is_sent_again():
+    r = _client().get("/doc", headers={"If-None-Match": 'W/"stale"'})
+    assert r.status_code == 200
+    assert r.content == BODY
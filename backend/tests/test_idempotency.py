@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Idempotency-Key 预留 / 接管 / 释放"""
+from __future__ import annotations
+
+import threading
+import uuid
+
+import pytest
+
+from app.services.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = IdempotencyStore(tmp_path / "idempotency.db")
+    yield s
+    s.close()
+
+
+def test_first_reserve_wins(store):
+    assert store.reserve("k", "job-a", "fp") == ("job-a", "fp")
+    # 后来者拿到的是已登记的 job_id，而不是自己的
+    assert store.reserve("k", "job-b", "fp2") == ("job-a", "fp")
+
+
+def test_concurrent_reserves_on_separate_connections(tmp_path):
+    """多个进程（各自一条连接）同时预留同一个键，只有一个取得"""
+    path = tmp_path / "idempotency.db"
+    stores = [IdempotencyStore(path) for _ in range(8)]
+    owners = []
+    barrier = threading.Barrier(len(stores))
+
+    def reserve(s):
+        job_id = uuid.uuid4().hex
+        barrier.wait()
+        owner, _ = s.reserve("k", job_id, "fp")
+        owners.append((job_id, owner))
+
+    threads = [threading.Thread(target=reserve, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for s in stores:
+        s.close()
+
+    winners = {owner for _, owner in owners}
+    assert len(winners) == 1
+    assert sum(job_id == owner for job_id, owner in owners) == 1
+
+
+def test_takeover_only_replaces_the_stale_owner(store):
+    store.reserve("k", "job-a", "fp")
+    assert not store.takeover("k", "job-x", "job-b")
+    assert store.takeover("k", "job-a", "job-b")
+    assert store.reserve("k", "job-c", "fp") == ("job-b", "fp")
+    # job-a 已被接管，再次接管失败
+    assert not store.takeover("k", "job-a", "job-c")
+
+
+def test_release_frees_the_key_for_its_owner_only(store):
+    store.reserve("k", "job-a", "fp")
+    store.release("k", "job-b")
+    assert store.reserve("k", "job-c", "fp")[0] == "job-a"
+    store.release("k", "job-a")
+    assert store.reserve("k", "job-c", "fp")[0] == "job-c"
+
+
+def test_expired_keys_are_reusable(store, monkeypatch):
+    import app.services.idempotency as idem
+
+    store.reserve("k", "job-a", "fp")
+    real = idem.time.time
+    monkeypatch.setattr(idem.time, "time", lambda: real() + 10 * 86400)
+    assert store.reserve("k", "job-b", "fp")[0] == "job-b"
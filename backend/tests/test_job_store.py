@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""启动恢复：embedded 与共享队列（external）模式下的 recover()"""
+from __future__ import annotations
+
+import time
+import uuid
+from datetime import datetime
+
+import pytest
+
+from app.models import JobStatus
+from app.services.job_manager import LOCAL_WORKER
+from app.services.job_store import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = JobStore(tmp_path / "jobs.db")
+    yield s
+    s.close()
+
+
+def _job(store, request, status, worker=None):
+    rec = store.create(
+        uuid.uuid4().hex, request,
+        created_at=datetime.now().isoformat(timespec="seconds"),
+        submitted_ts=time.time(), group_id=None, label=None,
+    )
+    rec.status = status
+    rec.worker = worker
+    store.save(rec)
+    return rec.job_id
+
+
+def _status(store, job_id):
+    return store.statuses([job_id])[job_id]
+
+
+def test_embedded_recover_fails_every_unfinished_job_and_study(store, sample_request):
+    pending = _job(store, sample_request, JobStatus.pending)
+    running = _job(store, sample_request, JobStatus.running, worker="agent-1")
+    done = _job(store, sample_request, JobStatus.completed, worker=LOCAL_WORKER)
+    store.save_study({"study_id": "s1", "status": JobStatus.running.value})
+    store.save_study({"study_id": "s2", "status": JobStatus.completed.value})
+
+    assert store.recover() == 2
+    assert _status(store, pending) == JobStatus.failed
+    assert _status(store, running) == JobStatus.failed
+    assert _status(store, done) == JobStatus.completed
+    assert store.load(running).error
+    assert store.load_study("s1")["status"] == JobStatus.failed.value
+    assert store.load_study("s2")["status"] == JobStatus.completed.value
+
+
+def test_scheduler_recover_only_fails_its_own_running_jobs(store, sample_request):
+    pending = _job(store, sample_request, JobStatus.pending)
+    local = _job(store, sample_request, JobStatus.running, worker=LOCAL_WORKER)
+    leased = _job(store, sample_request, JobStatus.running, worker="agent-1")
+    store.save_study({"study_id": "s1", "status": JobStatus.running.value})
+
+    assert store.recover(local_worker=LOCAL_WORKER) == 1
+    assert _status(store, local) == JobStatus.failed
+    # 共享队列中的 pending 任务仍有效；agent 租约由回收逻辑处理
+    assert _status(store, pending) == JobStatus.pending
+    assert _status(store, leased) == JobStatus.running
+    # 研究运行在 API 进程中，不由调度进程处理
+    assert store.load_study("s1")["status"] == JobStatus.running.value
+
+
+def test_stale_studies_are_failed_by_heartbeat(store):
+    now = time.time()
+    store.save_study({"study_id": "dead", "status": "running", "heartbeat": now - 600})
+    store.save_study({"study_id": "legacy", "status": "pending"})
+    store.save_study({"study_id": "live", "status": "running", "heartbeat": now})
+    store.save_study({"study_id": "done", "status": "completed", "heartbeat": 0})
+
+    assert store.fail_stale_studies(now - 60) == 2
+    assert store.load_study("dead")["status"] == "failed"
+    assert store.load_study("legacy")["status"] == "failed"
+    assert store.load_study("live")["status"] == "running"
+    assert store.load_study("done")["status"] == "completed"
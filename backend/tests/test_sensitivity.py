@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""有限差分灵敏度：差分格式选择、Richardson 外推与步长细化"""
+from __future__ import annotations
+
+import asyncio
+import math
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+import pytest
+
+from app.models import CalculationResult, JobStatus, SensitivityRequest
+from app.services.columns import flatten_request
+from app.services.sensitivity import plan_steps, run_sensitivity
+
+
+class FakeStudy:
+    """以解析函数代替 FactSage：alpha_Ca_g = fn(扁平输入行)"""
+
+    def __init__(self, fn: Callable[[Dict[str, float]], float]) -> None:
+        self.fn = fn
+        self.points: List[Dict[str, float]] = []
+
+    async def evaluate(self, requests):
+        jobs = []
+        for req in requests:
+            row = flatten_request(req)
+            self.points.append(row)
+            jobs.append(SimpleNamespace(
+                job_id=str(len(self.points)),
+                status=JobStatus.completed,
+                error=None,
+                result=CalculationResult(alpha_Ca_g=self.fn(row)),
+            ))
+        return jobs
+
+
+def _run(study, body):
+    return asyncio.run(run_sensitivity(study, body))
+
+
+def test_plan_picks_central_unless_the_step_crosses_zero(sample_request):
+    body = SensitivityRequest(
+        base=sample_request, variables=["O_g", "S_g", "T_C"], rel_step=0.05,
+        steps={"S_g": 0.02},
+    )
+    plan = plan_steps(body)
+    assert plan["O_g"] == (0.003, pytest.approx(0.05 * 0.003), "central")
+    # S_g = 0.01，步长 0.02 会越过 0 → 前向差分
+    assert plan["S_g"] == (0.01, 0.02, "forward")
+    # 温度允许取负值，始终中心差分
+    assert plan["T_C"][2] == "central"
+
+
+def test_plan_rejects_zero_base_without_absolute_step(sample_request):
+    base = sample_request.model_copy(
+        update={"slag": sample_request.slag.model_copy(update={"Al2O3_g": 0.0})}
+    )
+    with pytest.raises(ValueError, match="绝对步长"):
+        plan_steps(SensitivityRequest(base=base, variables=["Al2O3_g"]))
+
+
+def test_central_richardson_is_exact_for_a_cubic(sample_request):
+    # 中心差商误差 h²f'''/6，外推（除以 3）后对三次多项式精确
+    study = FakeStudy(lambda r: 2 * r["O_g"] ** 3 + r["S_g"])
+    body = SensitivityRequest(
+        base=sample_request, variables=["O_g"], rel_step=0.5, tolerance=1.0,
+    )
+    out = _run(study, body)
+    x0 = 0.003
+    assert out["steps"]["O_g"]["scheme"] == "central"
+    assert out["steps"]["O_g"]["refinements"] == 0
+    assert out["jacobian"]["alpha_Ca_g"]["O_g"] == pytest.approx(6 * x0 ** 2, rel=1e-9)
+
+
+def test_forward_richardson_is_exact_for_a_quadratic(sample_request):
+    # 前向差商误差 h·f''/2，外推 2·D(h/2) − D(h) 对二次多项式精确
+    study = FakeStudy(lambda r: 3 * r["S_g"] ** 2 + 1.0)
+    body = SensitivityRequest(
+        base=sample_request, variables=["S_g"], steps={"S_g": 0.02}, tolerance=1.0,
+    )
+    out = _run(study, body)
+    assert out["steps"]["S_g"]["scheme"] == "forward"
+    assert out["jacobian"]["alpha_Ca_g"]["S_g"] == pytest.approx(6 * 0.01, rel=1e-9)
+    # 基准点 + h + h/2 三个点
+    assert len(study.points) == 3
+
+
+def test_refines_until_tolerance_and_reuses_points(sample_request):
+    study = FakeStudy(lambda r: math.exp(40 * r["S_g"]))
+    body = SensitivityRequest(
+        base=sample_request, variables=["S_g"], rel_step=0.5,
+        tolerance=1e-4, max_refinements=5,
+    )
+    out = _run(study, body)
+    step = out["steps"]["S_g"]
+    assert step["converged"]
+    assert step["refinements"] > 0
+    assert step["h"] == pytest.approx(0.5 * 0.01 / 2 ** (step["refinements"] + 1))
+    exact = 40 * math.exp(40 * 0.01)
+    assert out["jacobian"]["alpha_Ca_g"]["S_g"] == pytest.approx(exact, rel=1e-4)
+    # 每轮只新增 h/2 上的两个点（h 上的点上一轮已算过）
+    assert len(study.points) == 1 + 4 + 2 * step["refinements"]
+
+
+def test_stops_at_max_refinements_when_not_converged(sample_request):
+    study = FakeStudy(lambda r: math.exp(40 * r["S_g"]))
+    body = SensitivityRequest(
+        base=sample_request, variables=["S_g"], rel_step=0.5,
+        tolerance=1e-12, max_refinements=2,
+    )
+    step = _run(study, body)["steps"]["S_g"]
+    assert not step["converged"]
+    assert step["refinements"] == 2
+
+
+def test_elasticity_scales_by_base_values(sample_request):
+    study = FakeStudy(lambda r: 5 * r["O_g"] + 1.0)
+    out = _run(study, SensitivityRequest(base=sample_request, variables=["O_g"]))
+    f0 = 5 * 0.003 + 1.0
+    assert out["base"]["alpha_Ca_g"] == pytest.approx(f0)
+    assert out["elasticity"]["alpha_Ca_g"]["O_g"] == pytest.approx(5 * 0.003 / f0)
@@ -69,7 +69,35 @@ def main():
   server.port         — 监听端口 (默认 10687)
   factsage.dir        — FactSage 安装目录
   factsage.exe_name   — 可执行文件名
+  factsage.runner     — oneshot (每任务启动一次 EquiSage) / session (常驻进程，
+                        数据库只加载一次；循环宏可用 templates/session_loop.mac.j2 覆盖)
   mock.enabled        — true/false/auto
+  dispatch.local_slots — 本机并行 FactSage 进程数 (0 = 仅调度，交给 agent)
+  autotune.enabled    — true 时按实测吞吐在 autotune.min_slots ~ max_slots (0 = CPU 核数)
+                        之间自动调整本机槽位数，local_slots 为起始值；
+                        当前 / 目标并发数见 GET /api/config/info 的 concurrency
+  dispatch.token      — 远程 agent 令牌 (主服务与 agent 须一致)
+  scratch.dir         — 运行时临时区 (RAM 盘路径，如 R:\\；空 = 不启用)
+  scratch.keep_raw    — true 时保留 EquiSage 原始输出压缩包 raw.zip
+  jobs.resident       — 内存中保留完整请求 / 结果的任务数 (默认 2000，其余按需从 work/jobs.db 读取)
+  jobs.max_records    — 内存中的任务记录数 (默认 20000，更早的任务查询时从库中重建)
+  recording.enabled   — true 时把 /api/calculate 请求录制到 work/_recordings/
+                        (滚动 JSONL，可用 benchmarks/replay.py 按 1×/10×/100× 重放)
+  reload.watch_seconds — >0 时自动检测 config.json 修改并热加载 (默认 0)
+                        也可 POST /api/config/reload 手动加载 (需 X-Admin-Token 令牌，
+                        未配置 admin.token 时仅限本机)；work_root、archive.dir、
+                        host/port/workers、scheduler.mode 需重启
+  admin.token         — 管理接口令牌 (重新加载配置)，与 dispatch.token 分开
+
+【Worker Agent 模式】
+  在其他装有 FactSage 的机器上运行:
+    FactSage_Ca_App.exe --agent http://主服务地址:10687 [--slots N]
+  agent 向主服务租用任务、本机计算后回传结果。
+
+【多进程部署】
+  config.json 中设置 scheduler.mode = external、server.workers = N 后:
+    FactSage_Ca_App.exe --scheduler     (调度进程，只启动一个)
+    FactSage_Ca_App.exe                 (N 个 API 进程，经 work/jobs.db 共享任务队列)
 
 【文件说明】
   FactSage_Ca_App.exe — 主程序
@@ -78,6 +106,7 @@ def main():
   presets/            — 预设参数文件
   frontend/           — Web 前端
   work/               — 运行时工作目录 (自动生成)
+  archive/            — 结果列式归档 Parquet (自动生成，按日分区)
   _internal/          — 程序依赖 (勿删)
 """
     (DIST / "README.txt").write_text(readme, encoding="utf-8")
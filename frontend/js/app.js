@@ -27,6 +27,12 @@
     const historyTbody = $("#historyTable tbody");
     const historyEmpty = $("#historyEmpty");
 
+    const bulkFile = $("#bulkFile");
+    const btnImport = $("#btnImport");
+    const bulkExport = $("#bulkExport");
+    const bulkStatus = $("#bulkStatus");
+    const bulkErrors = $("#bulkErrors");
+
     // 当前选中的计算类型
     let currentType = "deoxidation";
 
@@ -57,6 +63,7 @@
         );
         btnPreset.addEventListener("click", loadPreset);
         btnCalc.addEventListener("click", submitCalc);
+        btnImport.addEventListener("click", importBulk);
 
         // 目标元素下拉联动
         $("#target_element").addEventListener("change", function () {
@@ -177,7 +184,11 @@
         btnCalc.disabled = true;
 
         try {
-            const resp = await api("POST", "/calculate", body);
+            // 同一次提交的所有重试共用一个幂等键，服务端只会创建一个任务
+            const idemKey = newIdempotencyKey();
+            const resp = await withRetry(() =>
+                api("POST", "/calculate", body, { "Idempotency-Key": idemKey })
+            );
             // 轮询结果
             await pollJob(resp.job_id);
         } catch (e) {
@@ -272,7 +283,7 @@
 
     async function refreshHistory() {
         try {
-            const jobs = await api("GET", "/jobs");
+            const jobs = await api("GET", "/jobs?limit=20");
             if (!jobs.length) {
                 historyEmpty.classList.remove("hidden");
                 historyTbody.innerHTML = "";
@@ -312,12 +323,80 @@
         } catch (_) { /* ignore */ }
     }
 
+    // ── 批量导入 ──────────────────────────────────────
+
+    async function importBulk() {
+        const file = bulkFile.files[0];
+        if (!file) {
+            showBulkStatus("请先选择 CSV / Excel 文件", true);
+            return;
+        }
+        btnImport.disabled = true;
+        bulkExport.classList.add("hidden");
+        bulkErrors.classList.add("hidden");
+        showBulkStatus("上传中...");
+
+        try {
+            const res = await fetch(
+                `${API_BASE}/import?filename=${encodeURIComponent(file.name)}`,
+                { method: "POST", body: file }
+            );
+            const data = await res.json().catch(() => ({}));
+            if (data.errors && data.errors.length) {
+                bulkErrors.innerHTML = data.errors
+                    .map((e) => `<li>第 ${e.row} 行: ${escapeHtml(e.errors.join("; "))}</li>`)
+                    .join("");
+                bulkErrors.classList.remove("hidden");
+            }
+            if (!res.ok) {
+                const msg = typeof data.detail === "string"
+                    ? data.detail
+                    : "没有可提交的有效行";
+                showBulkStatus("导入失败: " + msg, true);
+                return;
+            }
+            bulkExport.href = `${API_BASE}/groups/${data.group_id}/export.csv`;
+            bulkExport.classList.remove("hidden");
+            await pollGroup(data.group_id, data.errors.length);
+        } catch (e) {
+            showBulkStatus("导入失败: " + e.message, true);
+        } finally {
+            btnImport.disabled = false;
+        }
+    }
+
+    async function pollGroup(groupId, skipped) {
+        const suffix = skipped ? `，${skipped} 行校验失败未提交` : "";
+        while (true) {
+            const g = await api("GET", `/groups/${groupId}`);
+            const finished = g.completed + g.failed;
+            showBulkStatus(
+                `任务组 ${groupId}: 完成 ${g.completed} / 失败 ${g.failed} / 共 ${g.total}${suffix}`
+            );
+            if (finished >= g.total) break;
+            await sleep(POLL_INTERVAL_MS * 3);
+        }
+        refreshHistory();
+    }
+
+    function showBulkStatus(msg, isError) {
+        bulkStatus.textContent = msg;
+        bulkStatus.classList.toggle("error", !!isError);
+        bulkStatus.classList.remove("hidden");
+    }
+
+    function escapeHtml(s) {
+        return String(s).replace(/[&<>"]/g, (c) =>
+            ({ "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;" }[c])
+        );
+    }
+
     // ── 工具函数 ──────────────────────────────────────
 
-    async function api(method, path, body) {
+    async function api(method, path, body, extraHeaders) {
         const opts = {
             method,
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", ...extraHeaders },
         };
         if (body) opts.body = JSON.stringify(body);
         const res = await fetch(API_BASE + path, opts);
@@ -338,6 +417,24 @@
         return res.json();
     }
 
+    // 仅对网络层失败（fetch 抛 TypeError）重试；HTTP 错误直接返回
+    async function withRetry(fn, attempts = 3) {
+        for (let i = 1; ; i++) {
+            try {
+                return await fn();
+            } catch (e) {
+                if (!(e instanceof TypeError) || i >= attempts) throw e;
+                await sleep(1000 * i);
+            }
+        }
+    }
+
+    function newIdempotencyKey() {
+        // crypto.randomUUID 仅在 HTTPS / localhost 可用，局域网 HTTP 下回退
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + "-" + Math.random().toString(36).slice(2, 12);
+    }
+
     function sleep(ms) {
         return new Promise((r) => setTimeout(r, ms));
     }
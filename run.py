@@ -10,16 +10,30 @@ if not getattr(sys, "frozen", False):
     if _backend not in sys.path:
         sys.path.insert(0, _backend)
 
+import multiprocessing
 import threading
 import webbrowser
 
 import uvicorn
 
-from app.main import app
 from app.config import settings
 
 
 def main():
+    # Worker agent 模式：python run.py --agent http://主服务:端口 [...]
+    if "--agent" in sys.argv[1:]:
+        from app.agent import main as agent_main
+
+        agent_main([a for a in sys.argv[1:] if a != "--agent"])
+        return
+
+    # 独立调度进程：python run.py --scheduler（需 scheduler.mode = external）
+    if "--scheduler" in sys.argv[1:]:
+        from app.scheduler import main as scheduler_main
+
+        scheduler_main([a for a in sys.argv[1:] if a != "--scheduler"])
+        return
+
     host = settings.server_host
     port = settings.server_port
     url = f"http://127.0.0.1:{port}"
@@ -37,8 +51,20 @@ def main():
     print("  按 Ctrl+C 停止服务")
     print("=" * 50)
 
-    uvicorn.run(app, host=host, port=port)
+    workers = settings.server_workers
+    if workers > 1 and settings.scheduler_mode != "external":
+        print("  server.workers > 1 需配合 scheduler.mode = external，按单进程启动")
+        workers = 1
+    if workers > 1:
+        # 多 worker 需以导入字符串启动；任务由 --scheduler 进程执行
+        print(f"  API 进程数: {workers}（请另行启动 --scheduler 调度进程）")
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers)
+    else:
+        from app.main import app
+
+        uvicorn.run(app, host=host, port=port)
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()